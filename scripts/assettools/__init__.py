@@ -0,0 +1,57 @@
+# Copyright 2019-2019 the openage authors. See copying.md for legal info.
+
+"""
+Tools for creating openage assets.
+
+The terrain and sprite functions can be used from other Python
+programs. Errors are raised as AssetError instead of exiting.
+Modules that need Pillow are only imported on first use, so
+importing the package is cheap.
+
+    import assettools
+
+    texture = assettools.open_image("terrain.png")
+    assettools.check_ratio(texture, inverse=False)
+    assettools.transform(texture, palette=None)
+
+The same tools are available from the command line:
+
+    $ python3 -m assettools --help
+"""
+
+import importlib
+
+from .errors import AssetError
+
+# Public functions and the module they are defined in
+_API = {
+    "open_image": "terrain",
+    "check_aoc_texture": "terrain",
+    "upscale": "terrain",
+    "save_hd_texture": "terrain",
+    "check_ratio": "terrain",
+    "transform": "terrain",
+    "inverse_transform": "terrain",
+    "save_transformed": "terrain",
+    "build_animation": "sprites",
+    "merge_sprites": "sprites",
+    "write_spritesheet": "sprites",
+    "watch": "sprites",
+    "FrameCache": "sprites",
+    "SpritesheetBuilder": "sprites",
+    "read_raw_frame": "rawframe",
+    "write_raw_frame": "rawframe",
+    "TerrainAtlas": "atlas",
+    "write_atlas": "atlas",
+}
+
+__all__ = ["AssetError"] + sorted(_API)
+
+
+def __getattr__(name):
+    if name not in _API:
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+    module = importlib.import_module("." + _API[name], __name__)
+
+    return getattr(module, name)
@@ -0,0 +1,11 @@
+# Copyright 2019-2019 the openage authors. See copying.md for legal info.
+
+"""
+Run the asset tools with python3 -m assettools.
+"""
+
+import sys
+
+from .cli import main
+
+sys.exit(main())
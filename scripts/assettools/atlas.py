@@ -0,0 +1,262 @@
+# Copyright 2019-2019 the openage authors. See copying.md for legal info.
+
+"""
+Terrain tile atlases.
+
+A terrain in dimetric projection (see terrain.transform()) is split
+into diamond shaped tiles of a fixed size. The tiles of several
+terrains are packed into shared atlas pages, so that the engine does
+not have to slice the terrains when they are loaded.
+
+The tile index is written as JSON:
+
+    {
+        "version": 0,
+        "tile_size": [64, 32],
+        "columns": 32,
+        "rows": 64,
+        "pages": ["atlas_0.png", "atlas_1.png"],
+        "terrains": {"grass": {"size": 8, "tiles": [0, 1, 2, ...]}}
+    }
+
+A terrain with size n consists of n*n tiles. Tile u + n * v is the
+tile u steps to the lower right and v steps to the lower left of the
+top tile. Its entry is a slot in the atlas: page slot // (columns * rows),
+column slot % columns and row (slot // columns) % rows of that page.
+Identical tiles share one slot.
+
+Tiles are cut with a diamond mask, so that the tiles of a terrain
+cover every pixel of its projected image exactly once.
+
+NumPy and Pillow are required.
+"""
+
+import json
+import os
+
+from .errors import AssetError
+
+INDEX_VERSION = 0
+
+# Tile masks by tile width
+_TILE_MASKS = dict()
+
+
+def tile_mask(tile_width):
+    """
+    Return the diamond mask of a tile as boolean array with shape
+    (tile_width // 2, tile_width).
+
+    The top corner of the diamond is half a pixel left of the tile
+    center, like the one of a projected terrain. Pixels on the lower
+    edges belong to the tile, pixels on the upper edges to its
+    neighbours. The mask is computed once per tile size and must
+    not be changed.
+    """
+
+    mask = _TILE_MASKS.get(tile_width)
+    if mask is not None:
+        return mask
+
+    import numpy
+
+    # Doubled pixel centers, relative to the top corner of the diamond
+    x_coords = 2 * numpy.arange(tile_width) + 2 - tile_width
+    y_coords = (2 * numpy.arange(tile_width // 2) + 1)[:, None]
+
+    # Lattice coordinates along both tile axes, scaled by 2 * tile_width
+    right = x_coords + 2 * y_coords
+    left = 2 * y_coords - x_coords
+
+    mask = (right > 0) & (right <= 2 * tile_width) & (left > 0) & (left <= 2 * tile_width)
+    mask.flags.writeable = False
+
+    _TILE_MASKS[tile_width] = mask
+
+    return mask
+
+
+def check_tile_width(img, tile_width):
+    """
+    Check if a projected terrain can be split into tiles of a width
+    and return the number of tiles along each axis.
+    """
+
+    res_x, res_y = img.size
+
+    if res_x != 2 * res_y:
+        raise AssetError("Image requires ratio of 2:1")
+
+    if tile_width <= 0 or tile_width % 4 != 0:
+        raise AssetError("Tile width has to be a positive multiple of 4")
+
+    if res_y % (tile_width // 2) != 0:
+        raise AssetError("Image height %i is not a multiple of the tile height %i"
+                         % (res_y, tile_width // 2))
+
+    return res_y // (tile_width // 2)
+
+
+def split_tiles(img, tile_width):
+    """
+    Split a terrain in dimetric projection into tiles.
+
+    Returns the tiles as RGBA arrays in index order.
+    """
+
+    import numpy
+
+    size = check_tile_width(img, tile_width)
+
+    pixels = numpy.asarray(img.convert('RGBA'))
+    mask = tile_mask(tile_width)[:, :, None]
+
+    tile_height = tile_width // 2
+    left_x = pixels.shape[1] // 2 - tile_height
+
+    tiles = list()
+
+    for v_index in range(size):
+        for u_index in range(size):
+            x_coord = left_x + (u_index - v_index) * tile_height
+            y_coord = (u_index + v_index) * tile_height // 2
+
+            tile = pixels[y_coord:y_coord + tile_height, x_coord:x_coord + tile_width]
+            tiles.append(numpy.where(mask, tile, 0).astype(numpy.uint8))
+
+    return tiles
+
+
+class TerrainAtlas:
+    """
+    Packs the tiles of several terrains into atlas pages.
+
+    All tiles have the same size, so they are placed in a grid
+    of slots. Pages are created when the previous one is full.
+    """
+
+    def __init__(self, tile_width, page_size=2048):
+        self.tile_width = tile_width
+        self.tile_height = tile_width // 2
+
+        self.columns = page_size // self.tile_width
+        self.rows = page_size // self.tile_height
+
+        if self.columns == 0 or self.rows == 0:
+            raise AssetError("Tiles of width %i do not fit on pages of size %i"
+                             % (tile_width, page_size))
+
+        # Tile contents in slot order and the slot of every content
+        self.tiles = list()
+        self.slots = dict()
+
+        # Size and tile slots of every terrain by name
+        self.terrains = dict()
+
+    def add(self, name, img):
+        """
+        Split a terrain in dimetric projection and add its tiles.
+        """
+
+        if name in self.terrains:
+            raise AssetError("Terrain %s is added twice" % name)
+
+        size = check_tile_width(img, self.tile_width)
+        tiles = split_tiles(img, self.tile_width)
+        terrain_slots = list()
+
+        for tile in tiles:
+            key = tile.tobytes()
+
+            slot = self.slots.get(key)
+            if slot is None:
+                slot = len(self.tiles)
+                self.slots[key] = slot
+                self.tiles.append(tile)
+
+            terrain_slots.append(slot)
+
+        self.terrains[name] = (size, terrain_slots)
+
+    def build(self):
+        """
+        Paste all tiles into the atlas pages.
+
+        Returns the pages as images.
+        """
+
+        import numpy
+        from PIL import Image
+
+        slots_per_page = self.columns * self.rows
+        pages = list()
+
+        for first_slot in range(0, len(self.tiles), slots_per_page):
+            page_tiles = self.tiles[first_slot:first_slot + slots_per_page]
+
+            # Pages are only as high as their used rows
+            used_rows = (len(page_tiles) + self.columns - 1) // self.columns
+            page = numpy.zeros((used_rows * self.tile_height,
+                                self.columns * self.tile_width, 4), dtype=numpy.uint8)
+
+            for index, tile in enumerate(page_tiles):
+                x_coord = (index % self.columns) * self.tile_width
+                y_coord = (index // self.columns) * self.tile_height
+
+                page[y_coord:y_coord + self.tile_height,
+                     x_coord:x_coord + self.tile_width] = tile
+
+            pages.append(Image.fromarray(page, 'RGBA'))
+
+        return pages
+
+    def index(self, page_names):
+        """
+        Return the tile index as JSON-serializable dictionary.
+        """
+
+        terrains = dict()
+        for name, (size, slots) in sorted(self.terrains.items()):
+            terrains[name] = {
+                "size": size,
+                "tiles": slots,
+            }
+
+        return {
+            "version": INDEX_VERSION,
+            "tile_size": [self.tile_width, self.tile_height],
+            "columns": self.columns,
+            "rows": self.rows,
+            "pages": page_names,
+            "terrains": terrains,
+        }
+
+
+def write_atlas(atlas, filename):
+    """
+    Save the pages of an atlas as <filename>_<page>.png and its
+    tile index as <filename>.json. Returns the index filename.
+    """
+
+    directory = os.path.dirname(filename)
+    page_names = list()
+
+    for page_number, page in enumerate(atlas.build()):
+        page_name = "%s_%i.png" % (os.path.basename(filename), page_number)
+
+        try:
+            page.save(os.path.join(directory, page_name), "PNG")
+        except IOError as error:
+            raise AssetError("File %s could not be written" % page_name) from error
+
+        page_names.append(page_name)
+
+    index_name = filename + ".json"
+
+    try:
+        with open(index_name, "w") as index_file:
+            json.dump(atlas.index(page_names), index_file, separators=(",", ":"))
+    except OSError as error:
+        raise AssetError("File %s could not be written" % index_name) from error
+
+    return index_name
@@ -0,0 +1,447 @@
+# Copyright 2019-2019 the openage authors. See copying.md for legal info.
+
+"""
+Dependency-aware asset builds.
+
+A build description lists steps with the tool they run, their input
+and output files and the tool parameters:
+
+    {
+        "steps": [
+            {"name": "grass_hd", "tool": "upscale",
+             "inputs": ["grass.png"], "outputs": ["grass_hd.png"]},
+            {"name": "grass", "tool": "transform",
+             "inputs": ["grass_hd.png"], "outputs": ["grass_t.png"]},
+            {"name": "knight", "tool": "render",
+             "inputs": ["knight.blend"], "outputs": ["knight/walk"],
+             "params": {"args": ["-t", "walk"]}},
+            {"name": "knight_walk", "tool": "merge",
+             "inputs": ["knight/walk"],
+             "outputs": ["knight/walk_animation.png", "knight/walk_animation.sprite"]}
+        ]
+    }
+
+A step depends on the steps that produce its inputs. Steps whose
+dependencies are done run in parallel. Outputs are stored in a local
+content-addressed cache under the hash of the tool, its parameters
+and the content of its inputs, so unchanged steps are restored from
+the cache instead of being run again.
+
+Paths are relative to the folder of the build description.
+"""
+
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+
+from .errors import AssetError
+from .fileutil import atomic_write
+from . import rawframe
+
+# Increase to invalidate all cached outputs after tool changes
+BUILD_VERSION = 0
+
+# Number of output lines of a failed render shown in the error
+OUTPUT_TAIL = 10
+
+CREATE_SPRITES = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                              "..", "blender", "create_sprites.py")
+
+
+class BuildStep:
+    """
+    One node of the build graph.
+    """
+
+    def __init__(self, name, tool, inputs, outputs, params):
+        self.name = name
+        self.tool = tool
+        self.inputs = inputs
+        self.outputs = outputs
+        self.params = params
+
+        # Names of the steps this step depends on
+        self.dependencies = set()
+
+
+def load_build(filename):
+    """
+    Read a build description and return its steps by name,
+    with all paths made absolute.
+    """
+
+    try:
+        with open(filename, "r") as build_file:
+            description = json.load(build_file)
+    except (OSError, ValueError) as error:
+        raise AssetError("Build description %s could not be read: %s"
+                         % (filename, error)) from error
+
+    base = os.path.dirname(os.path.abspath(filename))
+    steps = dict()
+
+    for index, entry in enumerate(description.get("steps", list())):
+        name = entry.get("name", "step%i" % index)
+
+        if name in steps:
+            raise AssetError("Step %s is defined twice" % name)
+
+        tool = entry.get("tool")
+        if tool not in TOOLS:
+            raise AssetError("Step %s uses unknown tool %s" % (name, tool))
+
+        steps[name] = BuildStep(name, tool,
+                                [os.path.join(base, path) for path in entry.get("inputs", ())],
+                                [os.path.join(base, path) for path in entry.get("outputs", ())],
+                                entry.get("params", dict()))
+
+    link_steps(steps)
+
+    return steps
+
+
+def link_steps(steps):
+    """
+    Find the dependencies of every step and check that
+    the build graph has no cycles.
+    """
+
+    producers = dict()
+    for step in steps.values():
+        for output in step.outputs:
+            if output in producers:
+                raise AssetError("%s is produced by %s and %s"
+                                 % (output, producers[output], step.name))
+            producers[output] = step.name
+
+    for step in steps.values():
+        for path in step.inputs:
+            for output, producer in producers.items():
+                # Inputs can be outputs or files inside output folders
+                if path == output or path.startswith(output + os.sep):
+                    if producer == step.name:
+                        raise AssetError("Step %s depends on its own output" % step.name)
+                    step.dependencies.add(producer)
+
+    # Every step has to be reachable in a topological order
+    done = set()
+    remaining = set(steps)
+
+    while remaining:
+        ready = {name for name in remaining if steps[name].dependencies <= done}
+        if not ready:
+            raise AssetError("The steps %s depend on each other"
+                             % ", ".join(sorted(remaining)))
+        done |= ready
+        remaining -= ready
+
+
+def path_hash(path, sha):
+    """
+    Add the content of a file or all files in a folder to a hash.
+    """
+
+    if os.path.isdir(path):
+        for directory, subdirs, files in os.walk(path):
+            subdirs.sort()
+            for filename in sorted(files):
+                file_path = os.path.join(directory, filename)
+                sha.update(os.path.relpath(file_path, path).encode())
+                path_hash(file_path, sha)
+        return
+
+    try:
+        with open(path, "rb") as infile:
+            for chunk in iter(lambda: infile.read(1 << 20), b""):
+                sha.update(chunk)
+    except OSError as error:
+        raise AssetError("Input %s could not be read: %s" % (path, error)) from error
+
+
+def step_key(step, base):
+    """
+    Return the cache key of a step: the hash of its tool,
+    parameters, output names and input content.
+    """
+
+    sha = hashlib.sha256()
+    sha.update(json.dumps([BUILD_VERSION, step.tool, step.params,
+                           [os.path.relpath(path, base) for path in step.outputs]],
+                          sort_keys=True).encode())
+
+    for path in step.inputs:
+        sha.update(os.path.relpath(path, base).encode())
+        path_hash(path, sha)
+
+    return sha.hexdigest()
+
+
+class BuildCache:
+    """
+    Local content-addressed store of step outputs.
+
+    Files are stored once under the hash of their content. An entry
+    maps a step key to the files of every output of the step.
+    """
+
+    def __init__(self, directory):
+        self.objects = os.path.join(directory, "objects")
+        self.entries = os.path.join(directory, "entries")
+
+        os.makedirs(self.objects, exist_ok=True)
+        os.makedirs(self.entries, exist_ok=True)
+
+    def restore(self, key, outputs):
+        """
+        Copy the cached outputs of a step into place.
+        Returns False if the step is not cached.
+        """
+
+        try:
+            with open(os.path.join(self.entries, key + ".json"), "r") as entry_file:
+                entry = json.load(entry_file)
+        except (OSError, ValueError):
+            return False
+
+        if len(entry) != len(outputs):
+            return False
+
+        for files in entry:
+            for _, content_hash in files:
+                if not os.path.exists(os.path.join(self.objects, content_hash)):
+                    return False
+
+        for output, files in zip(outputs, entry):
+            if os.path.isdir(output):
+                shutil.rmtree(output)
+
+            for relpath, content_hash in files:
+                target = os.path.normpath(os.path.join(output, relpath))
+                directory = os.path.dirname(target)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                shutil.copyfile(os.path.join(self.objects, content_hash), target)
+
+        return True
+
+    def store(self, key, outputs):
+        """
+        Put the outputs of a step into the cache.
+        """
+
+        entry = list()
+
+        for output in outputs:
+            if os.path.isdir(output):
+                files = list()
+                for directory, _, filenames in os.walk(output):
+                    for filename in sorted(filenames):
+                        file_path = os.path.join(directory, filename)
+                        files.append((os.path.relpath(file_path, output).replace(os.sep, "/"),
+                                      self.store_file(file_path)))
+            elif os.path.isfile(output):
+                files = [(".", self.store_file(output))]
+            else:
+                raise AssetError("Output %s was not created" % output)
+
+            entry.append(files)
+
+        with atomic_write(os.path.join(self.entries, key + ".json")) as entry_file:
+            json.dump(entry, entry_file)
+
+    def store_file(self, path):
+        """
+        Copy a file into the object store and return its content hash.
+        """
+
+        sha = hashlib.sha256()
+        path_hash(path, sha)
+        content_hash = sha.hexdigest()
+
+        target = os.path.join(self.objects, content_hash)
+        if not os.path.exists(target):
+            with open(path, "rb") as infile, atomic_write(target, "wb") as outfile:
+                shutil.copyfileobj(infile, outfile)
+
+        return content_hash
+
+
+def run_build(filename, jobs=None, cache_dir=None):
+    """
+    Build all steps of a build description.
+
+    Returns the names of the steps that were run and of the
+    steps that were restored from the cache.
+    """
+
+    steps = load_build(filename)
+    base = os.path.dirname(os.path.abspath(filename))
+
+    if cache_dir is None:
+        cache_dir = os.path.join(base, ".assetcache")
+    cache = BuildCache(cache_dir)
+
+    done = set()
+    built = list()
+    restored = list()
+
+    # Running steps by future
+    running = dict()
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        while len(done) < len(steps):
+            started = {step.name for step, _ in running.values()}
+            ready = [step for name, step in sorted(steps.items())
+                     if name not in done and name not in started and
+                     step.dependencies <= done]
+
+            for step in ready:
+                key = step_key(step, base)
+
+                if cache.restore(key, step.outputs):
+                    print("Restored: %s" % step.name)
+                    restored.append(step.name)
+                    done.add(step.name)
+                    continue
+
+                print("Building: %s" % step.name)
+                future = executor.submit(run_step, step.tool, step.inputs,
+                                         step.outputs, step.params)
+                running[future] = (step, key)
+
+            # Restored steps may have made further steps ready
+            if not running:
+                continue
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+
+            for future in finished:
+                step, key = running.pop(future)
+
+                try:
+                    future.result()
+                except (AssetError, OSError) as error:
+                    raise AssetError("Step %s failed: %s" % (step.name, error)) from error
+
+                cache.store(key, step.outputs)
+                built.append(step.name)
+                done.add(step.name)
+
+    return built, restored
+
+
+def run_step(tool, inputs, outputs, params):
+    """
+    Run the tool of a step. Called in a worker process.
+    """
+
+    for output in outputs:
+        directory = os.path.dirname(output)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    TOOLS[tool](inputs, outputs, params)
+
+
+def tool_upscale(inputs, outputs, params):
+    """
+    Scale an AoC terrain texture to HD size.
+    """
+
+    from . import terrain
+
+    aoc_texture = terrain.open_image(inputs[0])
+    terrain.check_aoc_texture(aoc_texture)
+
+    save_image(terrain.upscale(aoc_texture), outputs[0], "PNG")
+
+
+def tool_transform(inputs, outputs, params):
+    """
+    Transform a texture to or from dimetric projection.
+    An optional second input is the palette for legacy mode.
+    """
+
+    from . import terrain
+
+    inverse = params.get("inverse", False)
+    palette = inputs[1] if len(inputs) > 1 else None
+
+    org_img = terrain.open_image(inputs[0])
+    terrain.check_ratio(org_img, inverse)
+
+    if inverse:
+        tr_img = terrain.inverse_transform(org_img, palette)
+    else:
+        tr_img = terrain.transform(org_img, palette)
+
+    save_image(tr_img, outputs[0], "BMP" if palette else "PNG")
+
+
+def save_image(img, path, image_format):
+    """
+    Save the result of a tool. Outputs with the raw frame
+    extension are written uncompressed.
+    """
+
+    if rawframe.is_raw_frame(path):
+        rawframe.write_image(path, img)
+        return
+
+    try:
+        img.save(path, image_format)
+    except IOError as error:
+        raise AssetError("File %s could not be written" % path) from error
+
+
+def tool_merge(inputs, outputs, params):
+    """
+    Create the spritesheet of an animation folder.
+    """
+
+    from . import sprites
+
+    # The .sprite file references the spritesheet relative to
+    # the folder it is in
+    directory, anim = os.path.split(inputs[0])
+    previous_cwd = os.getcwd()
+
+    os.chdir(directory)
+    try:
+        sprites.build_animation(anim, params.get("alpha_threshold", 0),
+                                layers=params.get("layers", ()))
+    finally:
+        os.chdir(previous_cwd)
+
+
+def tool_render(inputs, outputs, params):
+    """
+    Render sprites from a .blend file with create_sprites.py.
+    """
+
+    command = [params.get("blender", "blender"), "--background", inputs[0],
+               "--python", params.get("script", CREATE_SPRITES), "--"]
+    command += params.get("args", list())
+
+    try:
+        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                universal_newlines=True, check=False)
+    except OSError as error:
+        raise AssetError("Could not start %s: %s" % (command[0], error)) from error
+
+    if result.returncode != 0:
+        # create_sprites.py prints the reason of a failure at the end
+        output = result.stdout.splitlines()[-OUTPUT_TAIL:]
+        raise AssetError("Blender exited with code %i:\n%s"
+                         % (result.returncode, "\n".join("  " + line for line in output)))
+
+
+TOOLS = {
+    "upscale": tool_upscale,
+    "transform": tool_transform,
+    "merge": tool_merge,
+    "render": tool_render,
+}
@@ -0,0 +1,262 @@
+# Copyright 2019-2019 the openage authors. See copying.md for legal info.
+
+"""
+Command line interface of the asset tools.
+
+Every tool is a subcommand. The modules of a tool are only
+imported when its subcommand runs, so starting up is fast.
+"""
+
+import argparse
+from collections import OrderedDict
+import os
+import sys
+
+from .errors import AssetError
+from .rawframe import RAW_EXTENSION
+
+
+def main(argv=None):
+    """
+    CLI entry point. Returns the exit code.
+    """
+
+    return run(get_args(argv))
+
+
+def run_tool(name, argv=None):
+    """
+    Run a single tool with its own argument parser, like the
+    standalone scripts do. Returns the exit code.
+    """
+
+    add_args, description = TOOLS[name]
+
+    parser = argparse.ArgumentParser(description=description)
+    add_args(parser)
+
+    return run(parser.parse_args(argv))
+
+
+def run(args):
+    """
+    Run the tool selected by the parsed arguments.
+    """
+
+    try:
+        args.func(args)
+    except AssetError as error:
+        print("Error: %s" % error, file=sys.stderr)
+        return 1
+
+    return 0
+
+
+def get_args(argv=None):
+    """
+    Get CLI arguments.
+    """
+
+    parser = argparse.ArgumentParser(prog="assettools",
+                                     description="Tools for creating openage assets.")
+    subparsers = parser.add_subparsers(dest="command", metavar="command")
+    subparsers.required = True
+
+    for name, (add_args, description) in TOOLS.items():
+        add_args(subparsers.add_parser(name, help=description, description=description))
+
+    return parser.parse_args(argv)
+
+
+def add_upscale_args(parser):
+    """
+    Arguments of the upscale subcommand.
+    """
+
+    parser.add_argument('inputfile', nargs='+', help="The terrain textures from AoC")
+    parser.add_argument('--raw', default=False, action='store_true',
+                        help=("Writes uncompressed %s frames instead of PNG, "
+                              "for further processing by other tools." % RAW_EXTENSION))
+    parser.set_defaults(func=run_upscale)
+
+
+def add_transform_args(parser):
+    """
+    Arguments of the transform subcommand.
+    """
+
+    parser.add_argument('inputfile', nargs='+', help='The images you want to transform')
+    parser.add_argument('-i', '--inverse', default=False, action='store_true',
+                        help='Transforms from dimetric to cartesian')
+    parser.add_argument('--legacy-mode', dest='palette_file',
+                        help=("Uses BMP instead of PNG as output format and the "
+                              "color PINK (255,0,255) for background instead of the "
+                              "ALPHA channel. Requires an image with the AoE2 palette."))
+    parser.add_argument('--atlas', dest='atlas_name',
+                        help=("Splits the results into dimetric tiles and packs the tiles "
+                              "of all images into shared atlas pages ATLAS_NAME_<page>.png "
+                              "with the tile index ATLAS_NAME.json."))
+    parser.add_argument('--tile-width', default=64, type=int,
+                        help="Width of the atlas tiles in pixels; default = 64")
+    parser.add_argument('--page-size', default=2048, type=int,
+                        help="Maximum width and height of the atlas pages; default = 2048")
+    parser.add_argument('--raw', default=False, action='store_true',
+                        help=("Writes uncompressed %s frames instead of PNG, "
+                              "for further processing by other tools." % RAW_EXTENSION))
+    parser.set_defaults(func=run_transform)
+
+
+def add_merge_args(parser):
+    """
+    Arguments of the merge subcommand.
+    """
+
+    parser.add_argument("--folders", type=str, help="Folders with frames.")
+    parser.add_argument("-a", "--alpha-threshold", type=int, help="Threshold for alpha channel.")
+    parser.add_argument("-l", "--layers", type=str,
+                        help=("Additional layers in subfolders of the animation folders, "
+                              "separate with ,"))
+    parser.add_argument("-w", "--watch", default=False, action='store_true',
+                        help="Keep running and rebuild spritesheets when frames change.")
+    parser.add_argument("--debounce", default=1.0, type=float,
+                        help="Seconds to wait after the last change before rebuilding; default = 1.0")
+    parser.add_argument("--cache-size", default=4096, type=int,
+                        help="Maximum number of decoded frames kept in watch mode; default = 4096")
+    parser.set_defaults(func=run_merge)
+
+
+def add_build_args(parser):
+    """
+    Arguments of the build subcommand.
+    """
+
+    parser.add_argument("buildfile", help="JSON build description.")
+    parser.add_argument("-j", "--jobs", type=int,
+                        help="Number of parallel steps; default = number of CPUs")
+    parser.add_argument("--cache", type=str,
+                        help="Cache folder; default = .assetcache next to the build description")
+    parser.set_defaults(func=run_build)
+
+
+def run_upscale(args):
+    """
+    Upscale all given AoC textures.
+    """
+
+    from . import terrain
+
+    for inputfile in args.inputfile:
+        aoc_texture = terrain.open_image(inputfile)
+        terrain.check_aoc_texture(aoc_texture)
+
+        hd_texture = terrain.upscale(aoc_texture)
+
+        output_name = terrain.save_hd_texture(hd_texture, inputfile, args.raw)
+        print("Success: result saved as {:s}".format(output_name))
+
+
+def run_transform(args):
+    """
+    Transform all given images.
+    """
+
+    from . import terrain
+
+    palette = args.palette_file
+
+    if palette and args.raw:
+        raise AssetError("--raw can not be combined with --legacy-mode")
+
+    if args.atlas_name:
+        run_atlas(args)
+        return
+
+    for inputfile in args.inputfile:
+        org_img = terrain.open_image(inputfile)
+        terrain.check_ratio(org_img, args.inverse)
+
+        if args.inverse:
+            tr_img = terrain.inverse_transform(org_img, palette)
+        else:
+            tr_img = terrain.transform(org_img, palette)
+
+        output_name = terrain.save_transformed(tr_img, palette,
+                                               inputfile.split(".")[0] + "_t", args.raw)
+        print("Success: result saved as {:s}".format(output_name))
+
+
+def run_atlas(args):
+    """
+    Transform all given images and pack their tiles into an atlas.
+    """
+
+    from . import atlas, terrain
+
+    if args.inverse or args.palette_file or args.raw:
+        raise AssetError("--atlas can not be combined with --inverse, --legacy-mode or --raw")
+
+    terrain_atlas = atlas.TerrainAtlas(args.tile_width, args.page_size)
+
+    for inputfile in args.inputfile:
+        org_img = terrain.open_image(inputfile)
+        terrain.check_ratio(org_img, False)
+
+        name = os.path.splitext(os.path.basename(inputfile))[0]
+        terrain_atlas.add(name, terrain.transform(org_img, None))
+
+    output_name = atlas.write_atlas(terrain_atlas, args.atlas_name)
+    print("Success: %i tiles saved, index saved as %s"
+          % (len(terrain_atlas.tiles), output_name))
+
+
+def run_merge(args):
+    """
+    Create the spritesheets of all given animation folders.
+    """
+
+    from . import sprites
+
+    if args.folders is None:
+        raise AssetError("No animations specfied")
+
+    animations = args.folders.split(",")
+
+    if args.alpha_threshold is None:
+        print("Transparency threshold: 0")
+        transparency_threshold = 0
+    else:
+        print("Transparency threshold: %i" % args.alpha_threshold)
+        transparency_threshold = args.alpha_threshold
+
+    if args.layers is None:
+        layers = list()
+    else:
+        layers = args.layers.split(",")
+
+    if args.watch:
+        sprites.watch(animations, transparency_threshold, args.debounce, args.cache_size,
+                      layers)
+    else:
+        for anim in animations:
+            sprites.build_animation(anim, transparency_threshold, layers=layers)
+
+
+def run_build(args):
+    """
+    Build all steps of a build description.
+    """
+
+    from . import build
+
+    built, restored = build.run_build(args.buildfile, args.jobs, args.cache)
+    print("Built %i steps, restored %i steps from cache" % (len(built), len(restored)))
+
+
+# Subcommands with the function adding their arguments and their description
+TOOLS = OrderedDict((
+    ("upscale", (add_upscale_args, "Scale terrain texture from AoC to HD format")),
+    ("transform", (add_transform_args, "Transforms an image from cartesian "
+                                       "to dimetric projection.")),
+    ("merge", (add_merge_args, "Create spritesheets from multiple frames and angles.")),
+    ("build", (add_build_args, "Run the steps of an asset build description.")),
+))
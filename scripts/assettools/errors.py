@@ -0,0 +1,11 @@
+# Copyright 2019-2019 the openage authors. See copying.md for legal info.
+
+"""
+Exceptions of the asset tools.
+"""
+
+
+class AssetError(Exception):
+    """
+    An asset could not be read, converted or written.
+    """
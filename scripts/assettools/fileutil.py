@@ -0,0 +1,34 @@
+# Copyright 2019-2019 the openage authors. See copying.md for legal info.
+
+"""
+File helpers shared by the asset tools and the Blender scripts.
+"""
+
+from contextlib import contextmanager
+import os
+
+
+@contextmanager
+def atomic_write(path, mode="w"):
+    """
+    Open a temporary file for writing that replaces path in one
+    step when the with block ends without an error.
+
+    Parallel workers can write the same file this way, and readers
+    never see a partly written file. A reader that has the old file
+    mapped into memory keeps its content, instead of being killed by
+    SIGBUS when the file is truncated.
+    """
+
+    temp_path = "%s.%i.tmp" % (path, os.getpid())
+
+    try:
+        with open(temp_path, mode) as outfile:
+            yield outfile
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,151 @@
+# Copyright 2019-2019 the openage authors. See copying.md for legal info.
+
+"""
+Uncompressed intermediate frame format.
+
+Tools that run on the same machine can hand frames to each other
+in this format instead of PNG, which saves the zlib compression and
+decompression at every step. A file consists of a small header and
+the raw RGBA pixels, row by row from the top:
+
+    magic    4 bytes  b"OARF"
+    version  uint16
+    (unused) uint16
+    width    uint32
+    height   uint32
+    hotspot  2x int32  (-1 if unknown)
+    angle    int32     (-1 if unknown)
+    frame    int32     (-1 if unknown)
+
+All values are little endian. Files are read with a read-only memory
+map, so the pixels are not copied when a frame is opened. Images
+created from a mapped frame can not be changed; they have to be
+copied first.
+"""
+
+from collections import namedtuple
+import mmap
+import os
+import struct
+
+from .errors import AssetError
+from .fileutil import atomic_write
+
+RAW_EXTENSION = ".rgba"
+
+MAGIC = b"OARF"
+VERSION = 0
+
+HEADER = struct.Struct("<4sHHIIiiii")
+
+RawFrame = namedtuple("RawFrame", ("width", "height", "hotspot", "angle", "frame", "pixels"))
+
+
+def is_raw_frame(path):
+    """
+    Check if a path has the extension of the raw frame format.
+    """
+
+    return path.endswith(RAW_EXTENSION)
+
+
+def write_raw_frame(path, size, pixels, hotspot=(-1, -1), angle=-1, frame=-1):
+    """
+    Write RGBA pixels (bytes or any buffer) of the given size to a file.
+
+    The file is replaced in one step, so readers that have the old
+    frame mapped are not affected.
+    """
+
+    width, height = size
+
+    if len(memoryview(pixels).cast("B")) != width * height * 4:
+        raise AssetError("Pixel data does not match the size %ix%i" % (width, height))
+
+    header = HEADER.pack(MAGIC, VERSION, 0, width, height,
+                         hotspot[0], hotspot[1], angle, frame)
+
+    try:
+        with atomic_write(path, "wb") as raw_file:
+            raw_file.write(header)
+            raw_file.write(pixels)
+    except OSError as error:
+        raise AssetError("File %s could not be written" % path) from error
+
+
+def read_raw_frame(path):
+    """
+    Map a raw frame file into memory.
+
+    The pixels of the returned frame are a read-only memoryview
+    into the file.
+    """
+
+    try:
+        with open(path, "rb") as raw_file:
+            if os.fstat(raw_file.fileno()).st_size < HEADER.size:
+                raise AssetError("%s is not a raw frame" % path)
+
+            data = mmap.mmap(raw_file.fileno(), 0, access=mmap.ACCESS_READ)
+    except OSError as error:
+        raise AssetError("Frame %s could not be read: %s" % (path, error)) from error
+
+    (magic, version, _, width, height,
+     hotspot_x, hotspot_y, angle, frame) = HEADER.unpack_from(data)
+
+    if magic != MAGIC or version != VERSION:
+        raise AssetError("%s is not a raw frame of version %i" % (path, VERSION))
+
+    pixels = memoryview(data)[HEADER.size:]
+
+    if len(pixels) != width * height * 4:
+        raise AssetError("%s is truncated" % path)
+
+    return RawFrame(width, height, (hotspot_x, hotspot_y), angle, frame, pixels)
+
+
+def read_frame_header(path):
+    """
+    Return hotspot, angle and frame from the header of a raw frame
+    without mapping its pixels.
+    """
+
+    try:
+        with open(path, "rb") as raw_file:
+            header = raw_file.read(HEADER.size)
+    except OSError as error:
+        raise AssetError("Frame %s could not be read: %s" % (path, error)) from error
+
+    if len(header) < HEADER.size:
+        raise AssetError("%s is not a raw frame" % path)
+
+    (magic, version, _, _, _, hotspot_x, hotspot_y, angle, frame) = HEADER.unpack(header)
+
+    if magic != MAGIC or version != VERSION:
+        raise AssetError("%s is not a raw frame of version %i" % (path, VERSION))
+
+    return (hotspot_x, hotspot_y), angle, frame
+
+
+def frame_to_image(raw_frame):
+    """
+    Return a Pillow image that shares the pixels of a raw frame.
+
+    The image is read-only, use its copy() to change pixels.
+    """
+
+    from PIL import Image
+
+    return Image.frombuffer('RGBA', (raw_frame.width, raw_frame.height),
+                            raw_frame.pixels, 'raw', 'RGBA', 0, 1)
+
+
+def write_image(path, image, hotspot=(-1, -1), angle=-1, frame=-1):
+    """
+    Write a Pillow image as raw frame.
+    """
+
+    if image.mode != 'RGBA':
+        image = image.convert('RGBA')
+
+    write_raw_frame(path, image.size, image.tobytes(), hotspot, angle, frame)
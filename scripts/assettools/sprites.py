@@ -0,0 +1,580 @@
+# Copyright 2019-2019 the openage authors. See copying.md for legal info.
+"""
+Create a spritesheet from multiple frames and angles.
+
+Pillow is required for image manipulation. Install with pip:
+
+    $ pip install pillow
+"""
+
+import os
+import time
+from collections import OrderedDict
+
+from .errors import AssetError
+from . import rawframe
+
+VERSION_NO = 0
+
+
+def build_animation(anim, transparency_threshold, frame_cache=None, layers=()):
+    """
+    Create the spritesheet and .sprite file for one animation folder.
+
+    If a frame cache is given, already decoded frames are taken from
+    it instead of being read from disk again.
+
+    Additional layers are read from subfolders of the animation folder
+    with the layer name. Their frames are cut out like the frames of
+    the main layer and packed into spritesheets with the same layout.
+    """
+
+    # List of individual sprites
+    im_list = list()
+
+    # Lists of individual sprites of the additional layers
+    layer_im_lists = [list() for _ in layers]
+
+    # Sprite meta information (angle, frame number, hotspot)
+    im_meta_list = list()
+
+    if not os.path.isdir(anim):
+        raise AssetError("Animation folder %s does not exist" % anim)
+
+    directory = os.fsencode(anim)
+    for file in sorted(os.listdir(directory)):
+        filename = os.fsdecode(file)
+
+        if filename.endswith(".png") or rawframe.is_raw_frame(filename):
+            paths = ["%s/%s" % (anim, filename)]
+            for layer in layers:
+                paths.append("%s/%s/%s" % (anim, layer, filename))
+
+            if frame_cache is None:
+                cut_out_ims, offset_hotspot = load_frame(paths, transparency_threshold)
+            else:
+                cut_out_ims, offset_hotspot = frame_cache.get(paths, transparency_threshold)
+
+            im_list.append(cut_out_ims[0])
+            for index in range(len(layers)):
+                layer_im_lists[index].append(cut_out_ims[index + 1])
+
+            file_info = frame_info(paths[0], filename)
+            meta_info = [file_info[0], file_info[1], offset_hotspot[0], offset_hotspot[1]]
+            im_meta_list.append(meta_info)
+
+    if not im_list:
+        raise AssetError("Animation folder %s has no frames" % anim)
+
+    spritesheet, frame_infos = merge_sprites(im_list, im_meta_list)
+
+    layer_sheets = list()
+    for index in range(len(layers)):
+        layer_sheet = paste_sprites(layer_im_lists[index], frame_infos, spritesheet.size)
+        layer_sheets.append((layers[index], layer_sheet))
+
+    write_spritesheet("%s_animation.png" % anim, spritesheet, im_meta_list, frame_infos,
+                      layer_sheets)
+
+
+def write_spritesheet(spritesheet_filename, spritesheet, im_meta_list, frame_infos,
+                      layer_sheets=()):
+    """
+    Save the spritesheet and its .sprite definition file.
+
+    Spritesheets of additional layers are given as (layer name, image)
+    and saved next to the spritesheet of the main layer.
+    """
+
+    spritesheet.save(spritesheet_filename)
+
+    layer_filenames = list()
+    for layer, layer_sheet in layer_sheets:
+        layer_filename = "%s_%s.png" % (spritesheet_filename[:-4], layer)
+        layer_sheet.save(layer_filename)
+        layer_filenames.append(layer_filename)
+
+    # Sprite meta information and location inside the spritesheet
+    sprite_meta_list = list()
+
+    for index in range(len(im_meta_list)):
+        sprite_meta_list.append([im_meta_list[index][0],
+                                 im_meta_list[index][1],
+                                 frame_infos[index][0],
+                                 frame_infos[index][1],
+                                 frame_infos[index][2],
+                                 frame_infos[index][3],
+                                 frame_infos[index][4],
+                                 frame_infos[index][5]])
+
+    sprite_meta_list = sorted(sprite_meta_list)
+
+    print_sprite_definition(spritesheet_filename, sprite_meta_list, layer_filenames)
+
+
+def load_frame(paths, transparency_threshold):
+    """
+    Read a frame and its layers from disk and cut them to their content.
+
+    The first path is the frame of the main layer. Returns the cut out
+    images and the hotspot relative to them.
+    """
+
+    from PIL import Image
+
+    layer_ims = list()
+    hotspot = None
+
+    for path in paths:
+        if rawframe.is_raw_frame(path):
+            raw_frame = rawframe.read_raw_frame(path)
+            current_im = rawframe.frame_to_image(raw_frame)
+
+            # The mapped image is read-only
+            if transparency_threshold > 0:
+                current_im = current_im.copy()
+
+            if hotspot is None and raw_frame.hotspot[0] >= 0:
+                hotspot = raw_frame.hotspot
+        else:
+            try:
+                current_im = Image.open(path)
+            except OSError as error:
+                raise AssetError("Frame %s could not be read: %s" % (path, error)) from error
+
+        if transparency_threshold > 0:
+            current_im = correct_alpha(current_im, transparency_threshold)
+
+        layer_ims.append(current_im)
+
+    if hotspot is None:
+        hotspot = find_hotspot(layer_ims[0])
+
+    return cut_out_layers(layer_ims, hotspot)
+
+
+def frame_info(path, filename):
+    """
+    Return angle and frame number of a frame.
+
+    Raw frames store them in their header, for other
+    frames they are read from the filename.
+    """
+
+    if rawframe.is_raw_frame(path):
+        _, angle, frame = rawframe.read_frame_header(path)
+
+        if angle >= 0 and frame >= 0:
+            return (angle, frame)
+
+    return parse_filename(filename)
+
+
+class FrameCache:
+    """
+    Bounded in-memory cache for decoded and preprocessed frames.
+
+    Entries are keyed by the paths of a frame's layers and validated
+    against the files' modification times and sizes, so changed
+    frames are read again.
+    The least recently used frames are dropped when the cache is full.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.frames = OrderedDict()
+
+    def get(self, paths, transparency_threshold):
+        """
+        Return the cut out layers of a frame and its hotspot.
+        """
+
+        key = (tuple(paths), transparency_threshold)
+        stamp = list()
+        for path in paths:
+            stat = os.stat(path)
+            stamp.append((stat.st_mtime_ns, stat.st_size))
+        stamp = tuple(stamp)
+
+        entry = self.frames.get(key)
+        if entry is not None and entry[0] == stamp:
+            self.frames.move_to_end(key)
+            return entry[1]
+
+        frame = load_frame(paths, transparency_threshold)
+        self.frames[key] = (stamp, frame)
+        self.frames.move_to_end(key)
+
+        while len(self.frames) > self.max_size:
+            self.frames.popitem(last=False)
+
+        return frame
+
+
+def folder_snapshot(anim, layers=()):
+    """
+    Return modification time and size of every frame in a folder
+    and its layer subfolders.
+    """
+
+    snapshot = dict()
+
+    for folder in [anim] + ["%s/%s" % (anim, layer) for layer in layers]:
+        if not os.path.isdir(folder):
+            continue
+
+        for entry in os.scandir(folder):
+            if entry.name.endswith(".png") or rawframe.is_raw_frame(entry.name):
+                stat = entry.stat()
+                snapshot[entry.path] = (stat.st_mtime_ns, stat.st_size)
+
+    return snapshot
+
+
+def watch(animations, transparency_threshold, debounce, cache_size, layers=(),
+          poll_interval=0.25):
+    """
+    Monitor the animation folders and rebuild the affected
+    spritesheets after files changed.
+
+    A rebuild is only started once no further change was seen
+    for the duration of the debounce window.
+    """
+
+    frame_cache = FrameCache(cache_size)
+
+    # Time of the last seen change for every folder with pending changes
+    pending = dict()
+
+    snapshots = dict()
+    for anim in animations:
+        snapshots[anim] = folder_snapshot(anim, layers)
+
+        try:
+            build_animation(anim, transparency_threshold, frame_cache, layers)
+        except (AssetError, OSError, ValueError) as error:
+            # The frames may not be rendered yet
+            print("Could not build %s: %s" % (anim, error))
+            pending[anim] = time.monotonic()
+
+    print("Watching %s (Ctrl+C to stop)" % ", ".join(animations))
+
+    try:
+        while True:
+            time.sleep(poll_interval)
+
+            now = time.monotonic()
+
+            for anim in animations:
+                try:
+                    snapshot = folder_snapshot(anim, layers)
+                except OSError:
+                    continue
+
+                if snapshot != snapshots[anim]:
+                    snapshots[anim] = snapshot
+                    pending[anim] = now
+
+            for anim, last_change in list(pending.items()):
+                if now - last_change < debounce:
+                    continue
+
+                del pending[anim]
+
+                try:
+                    time_start = time.time()
+                    build_animation(anim, transparency_threshold, frame_cache, layers)
+                    print("Rebuilt %s in %.4f seconds" % (anim, time.time() - time_start))
+                except (AssetError, OSError, ValueError) as error:
+                    # Frames may still be written by the renderer
+                    print("Could not rebuild %s: %s" % (anim, error))
+                    pending[anim] = now
+
+    except KeyboardInterrupt:
+        print("Stopped watching")
+
+
+def parse_filename(filename):
+    """
+    Read frame number and angle from filename.
+    """
+
+    frame_angle = int(filename[8:11])
+    frame_num = int(filename[0:3])
+
+    return (frame_angle, frame_num)
+
+
+def merge_sprites(im_list, im_meta_list):
+    """
+    Order single sprites into grid.
+    """
+
+    builder = SpritesheetBuilder()
+
+    for index in range(len(im_list)):
+        builder.add(im_list[index], im_meta_list[index])
+
+    return builder.build()
+
+
+def paste_sprites(im_list, frame_info_list, size):
+    """
+    Paste sprites into a spritesheet at the positions of
+    an existing layout.
+    """
+
+    from PIL import Image
+
+    result = Image.new('RGBA', size)
+
+    for index in range(len(im_list)):
+        result.paste(im_list[index], frame_info_list[index][0:2])
+
+    return result
+
+
+class SpritesheetBuilder:
+    """
+    Lays out sprites in a grid while they are added one by one.
+
+    Every sprite with angle 0 starts a new column. Sprites are
+    pasted into the spritesheet when they are added, which grows
+    as needed, so they do not have to be kept until the end.
+    """
+
+    def __init__(self):
+        self.current_x = 0
+        self.current_y = 0
+
+        # The width of the widest sprite in the current column
+        self.highest_width = 0
+
+        # Dimensions of the resulting spritesheet
+        self.result_height = 0
+        self.result_width = 0
+
+        # Spritesheet with room for more sprites, cropped in build()
+        self.sheet = None
+
+        # Saves the offests, dimensions and hotspots of sprite as 6-tuples
+        self.frame_info_list = list()
+
+    def add(self, image, meta_info):
+        """
+        Place a sprite with its meta information (angle, frame number, hotspot).
+        """
+
+        if meta_info[0] == 0:
+            self.current_x += self.highest_width
+            self.result_width += self.highest_width
+            self.current_y = 0
+            self.highest_width = 0
+
+        width, height = image.size
+
+        if width > self.highest_width:
+            self.highest_width = width
+
+        self.paste(image, (self.current_x, self.current_y))
+        new_hotspot_x = self.current_x + meta_info[2]
+        new_hotspot_y = self.current_y + meta_info[3]
+        self.frame_info_list.append((self.current_x,
+                                     self.current_y,
+                                     width,
+                                     height,
+                                     new_hotspot_x,
+                                     new_hotspot_y))
+
+        self.current_y += height
+
+        if self.current_y > self.result_height:
+            self.result_height = self.current_y
+
+    def paste(self, image, offset):
+        """
+        Paste a sprite into the spritesheet. If the sprite does not fit,
+        the spritesheet is enlarged to at least double its size.
+        """
+
+        from PIL import Image
+
+        width, height = image.size
+        needed_width = offset[0] + width
+        needed_height = offset[1] + height
+
+        if self.sheet is None:
+            self.sheet = Image.new('RGBA', (needed_width, needed_height))
+
+        sheet_width, sheet_height = self.sheet.size
+
+        if needed_width > sheet_width or needed_height > sheet_height:
+            if needed_width > sheet_width:
+                sheet_width = max(needed_width, 2 * sheet_width)
+            if needed_height > sheet_height:
+                sheet_height = max(needed_height, 2 * sheet_height)
+
+            grown_sheet = Image.new('RGBA', (sheet_width, sheet_height))
+            grown_sheet.paste(self.sheet, (0, 0))
+            self.sheet = grown_sheet
+
+        self.sheet.paste(image, offset)
+
+    def build(self):
+        """
+        Crop the spritesheet to the placed sprites.
+
+        Returns the spritesheet and the frame infos of the sprites.
+        """
+
+        from PIL import Image
+
+        size = (self.result_width + self.highest_width, self.result_height)
+
+        if self.sheet is None:
+            return (Image.new('RGBA', size), self.frame_info_list)
+
+        return (self.sheet.crop((0, 0) + size), self.frame_info_list)
+
+
+def find_hotspot(image):
+    """
+    Return center point of the image.
+    """
+
+    width, height = image.size
+    hotspot_x = -1
+    hotspot_y = -1
+
+    if width % 2 == 0:
+        hotspot_x = width//2 - 1
+    else:
+        hotspot_x = (width-1)//2
+
+    if height % 2 == 0:
+        hotspot_y = height//2 - 1
+    else:
+        hotspot_y = (height-1)//2
+
+    return (hotspot_x, hotspot_y)
+
+
+def cut_out(image, hotspot):
+    """
+    Remove surrounding alpha pixels.
+    """
+
+    crop_ims, offset_hotspot = cut_out_layers([image], hotspot)
+
+    return (crop_ims[0], offset_hotspot)
+
+
+def cut_out_layers(images, hotspot):
+    """
+    Remove surrounding alpha pixels from the layers of a frame.
+
+    All layers are cut to the same box, so that they stay aligned.
+    """
+
+    bounding_box = [hotspot[0], hotspot[1], hotspot[0], hotspot[1]]
+
+    layer_boxes = [image.getbbox() for image in images]
+    layer_boxes = [layer_box for layer_box in layer_boxes if layer_box is not None]
+
+    if layer_boxes:
+        bounding_box = [min(layer_box[0] for layer_box in layer_boxes),
+                        min(layer_box[1] for layer_box in layer_boxes),
+                        max(layer_box[2] for layer_box in layer_boxes),
+                        max(layer_box[3] for layer_box in layer_boxes)]
+
+    if hotspot[0] < bounding_box[0]:
+        bounding_box[0] = hotspot[0]
+    if hotspot[1] < bounding_box[1]:
+        bounding_box[1] = hotspot[1]
+    if hotspot[0] > bounding_box[2]:
+        bounding_box[2] = hotspot[0]
+    if hotspot[1] > bounding_box[3]:
+        bounding_box[3] = hotspot[1]
+
+    crop_ims = [image.crop(bounding_box) for image in images]
+    offset_hotspot = (hotspot[0] - bounding_box[0], hotspot[1] - bounding_box[1])
+
+    return (crop_ims, offset_hotspot)
+
+
+def correct_alpha(image, threshold):
+    """
+    Set pixels transparency values smaller then the threshold
+    to completely transparent (alpha = 0).
+    """
+
+    im_pixels = image.load()
+
+    res_x, res_y = image.size
+
+    for x_coord in range(res_x):
+        for y_coord in range(res_y):
+            cur_pixel = im_pixels[x_coord, y_coord]
+            cur_alpha_value = cur_pixel[3]
+
+            if cur_alpha_value < threshold:
+                im_pixels[x_coord, y_coord] = (cur_pixel[0], cur_pixel[1], cur_pixel[2], 0)
+
+    return image
+
+
+def print_sprite_definition(spritesheet_filename, meta_info, layer_filenames=()):
+    """
+    Prints the .sprite definition file.
+
+    Every additional layer has its own spritesheet with
+    the same layout as the main layer.
+    """
+
+    image_filenames = [spritesheet_filename] + list(layer_filenames)
+
+    file_content = ""
+
+    # Header definition
+    file_content += "# This file was automatically generated\n"
+    file_content += "version %s\n\n" % VERSION_NO
+
+    # Image file reference
+    file_content += "# Image file reference\n"
+    for image_id in range(len(image_filenames)):
+        file_content += "imagefile %i %s\n" % (image_id, image_filenames[image_id])
+    file_content += "\n"
+
+    # Layer definition
+    file_content += "# Layer definitions\n"
+    for layer_id in range(len(image_filenames)):
+        file_content += "layer %i mode=off position=default\n" % layer_id
+    file_content += "\n"
+
+    # Angle definitions
+    file_content += "# Angle definitions\n"
+
+    current_angle = -1
+
+    for index in range(len(meta_info)):
+
+        frame_angle = meta_info[index][0]
+
+        if current_angle != frame_angle:
+            file_content += "angle %s\n" % frame_angle
+            current_angle = frame_angle
+
+        # Layer i uses the spritesheet of image file i
+        for layer_id in range(len(image_filenames)):
+            file_content += "frame %i %i %i %i %i %i %i %i\n" % (layer_id,
+                                                                layer_id,
+                                                                meta_info[index][2],
+                                                                meta_info[index][3],
+                                                                meta_info[index][4],
+                                                                meta_info[index][5],
+                                                                meta_info[index][6],
+                                                                meta_info[index][7])
+
+    sprite_definition_filename = spritesheet_filename[:-4] + ".sprite"
+    with open(sprite_definition_filename, "w") as sprite_file:
+        sprite_file.write(file_content)
@@ -0,0 +1,298 @@
+# Copyright 2018-2019 the openage authors. See copying.md for legal info.
+
+"""
+Terrain texture conversion.
+
+A flat AoC texture (481x481) can be scaled to HD texture size
+(512x512) by doubling specific rows and columns, which is how the
+original developers enlarged the textures without upscaling.
+
+Images can be transformed from cartesian to dimetric projection
+and back. Files for the Genie Engine can be created by using a
+legacy mode that outputs BMP files.
+
+Pillow is required for image manipulation. Install with pip:
+
+    $ pip install pillow
+"""
+
+import math
+import os
+
+from .errors import AssetError
+from . import rawframe
+
+# Size of a flat AoC terrain texture
+AOC_TEXTURE_SIZE = 481
+
+
+def open_image(filename):
+    """
+    Read an image from disk.
+
+    Raw frames are mapped into memory instead of being decoded.
+    """
+
+    from PIL import Image
+
+    if rawframe.is_raw_frame(filename):
+        return rawframe.frame_to_image(rawframe.read_raw_frame(filename))
+
+    try:
+        return Image.open(filename)
+    except OSError as error:
+        raise AssetError("Image %s could not be read: %s" % (filename, error)) from error
+
+
+def check_aoc_texture(img):
+    """
+    Check if texture has the correct resolution (481x481).
+    """
+
+    res_x, res_y = img.size
+
+    if res_x != AOC_TEXTURE_SIZE or res_y != AOC_TEXTURE_SIZE:
+        raise AssetError("Image does not have AoC texture size (481x481)")
+
+
+def upscale(aoc_texture):
+    """
+    Upscale from original texture size
+    """
+
+    from PIL import Image
+
+    hd_texture = Image.new('RGBA', (514, 514), (255, 255, 255, 0))
+
+    aoc_pixels = aoc_texture.load()
+    hd_pixels = hd_texture.load()
+
+    # offsets for doubling
+    offset_y = 0
+    offset_x = 0
+
+    # iterator for counting up until double_width_*
+    # is reached. Starts at 7 because the first doubled
+    # row/column appears at (7,y)/(x,7)
+    offset_iterator_x = 7
+    offset_iterator_y = 7
+
+    # the width between two rows/columns which are supposed
+    # to be doubled. It alternates between the values 15
+    # and 16 (except for offset_* == 22)
+    double_width_x = 15
+    double_width_y = 15
+
+    # Pixel by pixel assignment of the correct colors
+    for x_coord in range(0, 514):
+
+        # Reset offset_y and its iterator for every new column
+        offset_y = 0
+        offset_iterator_y = 7
+
+        for y_coord in range(0, 514):
+
+            # Copy pixels over. The offset makes up for the smaller size of
+            # the AoC terrain texture.
+            hd_pixels[x_coord, y_coord] = aoc_pixels[x_coord - offset_x, y_coord - offset_y]
+
+            # Increase the offset when a new column that is supposed
+            # to be doubled is reached. This causes the pixel from this step
+            # to be read again in the next, thus doubling it.
+            if offset_iterator_y == double_width_y:
+                offset_y += 1
+                offset_iterator_y = 0
+
+                # Switch between a width of 15 and 16 between
+                # the columns that are doubled, except when offset_y
+                # is 22.
+                if double_width_y == 16 and offset_y != 22:
+                    double_width_y -= 1
+                elif double_width_y == 15:
+                    double_width_y += 1
+
+            # Increase iterator value after every pixel
+            offset_iterator_y += 1
+
+        # Increase the offset when a new row that is supposed
+        # to be doubled is reached. This causes the pixel from this step
+        # to be read again in the next, thus doubling it.
+        if offset_iterator_x == double_width_x:
+            offset_x += 1
+            offset_iterator_x = 0
+
+            # Switch between a width of 15 and 16 between
+            # the rows that are doubled, except when offset_y
+            # is 22.
+            if double_width_x == 16 and offset_x != 22:
+                double_width_x -= 1
+            elif double_width_x == 15:
+                double_width_x += 1
+
+        offset_iterator_x += 1
+
+    # The final image is to large, therefore we have to
+    # remove one pixel row at the top, one at the bottom
+    # and one pixel column on the left plus one on the right
+    hd_texture = hd_texture.crop((1, 1, 513, 513))
+
+    return hd_texture
+
+
+def save_hd_texture(img, inputfile, raw=False):
+    """
+    Writes the upscaled texture to file and returns its filename.
+
+    If raw is set, the texture is written as uncompressed raw frame.
+    """
+
+    directory, filename = os.path.split(inputfile)
+    output_name = os.path.join(directory, "output_" + filename)
+
+    if raw:
+        output_name = os.path.splitext(output_name)[0] + rawframe.RAW_EXTENSION
+        rawframe.write_image(output_name, img)
+        return output_name
+
+    try:
+        img.save(output_name, "PNG")
+    except IOError as error:
+        raise AssetError("File %s could not be written" % output_name) from error
+
+    return output_name
+
+
+def check_ratio(img, inverse):
+    """
+    Check if image has the correct ratio.
+    """
+
+    res_x, res_y = img.size
+
+    if inverse:
+        if res_x != 2 * res_y:
+            raise AssetError("Image requires ratio of 2:1")
+    else:
+        if res_x != res_y:
+            raise AssetError("Image requires ratio of 1:1")
+
+def transform(img, palette):
+    """
+    Flat to dimetric transformation.
+    """
+
+    from PIL import Image
+
+    res_x, res_y = img.size
+
+    # The transformed image is 2 times the size of the original
+    if palette:
+        # We need the background to be pink in legacy mode
+        tr_img = Image.new('RGB', (2 * res_x, res_y), (255, 0, 255))
+    else:
+        tr_img = Image.new('RGBA', (2 * res_x, res_y), (0, 0, 0, 0))
+
+    # Get the pixels
+    img = img.rotate(90)
+    org_pixels = img.load()
+    tr_pixels = tr_img.load()
+
+    # Transform the image
+    for x_coord in range(0, res_x):
+        for y_coord in range(0, res_y):
+
+            # Every pixel is transformed with simple matrix
+            # multiplication. The projection matrix is
+            #
+            # | 1   -1   |
+            # | 0.5  0.5 |
+            #
+            # The x result has to be offset by the x value of
+            # the original image.
+            tr_x = (1 * x_coord + res_x - 1) - 1 * y_coord
+            if x_coord+y_coord < res_y:
+                tr_y = math.ceil(0.5 * x_coord + 0.5 * y_coord)
+            else:
+                tr_y = math.floor(0.5 * x_coord + 0.5 * y_coord)
+
+            tr_pixels[tr_x, tr_y] = org_pixels[x_coord, y_coord]
+
+    if palette:
+        tr_img = tr_img.quantize(colors=256, palette=Image.open(palette))
+
+    return tr_img
+
+def inverse_transform(img, palette):
+    """
+    Dimetric to flat transformation.
+    """
+
+    from PIL import Image
+
+    res_x, res_y = img.size
+
+    tr_res_x = (int)((1/2) * res_x)
+
+    if palette:
+        # We need the background to be pink in legacy mode
+        tr_img = Image.new('RGB', (tr_res_x, res_y), (255, 0, 255))
+    else:
+        tr_img = Image.new('RGBA', (tr_res_x, res_y), (0, 0, 0, 0))
+
+    # Get the pixels
+    org_pixels = img.load()
+    tr_pixels = tr_img.load()
+
+    # Transform the image
+    for x_coord in range(0, tr_res_x):
+        for y_coord in range(0, res_y):
+
+            # This uses the exact calculation as in transform()
+            tr_x = (1 * x_coord + tr_res_x - 1) - 1 * y_coord
+            if x_coord+y_coord < res_y:
+                tr_y = math.ceil(0.5 * x_coord + 0.5 * y_coord)
+            else:
+                tr_y = math.floor(0.5 * x_coord + 0.5 * y_coord)
+
+            # We just need to swap (tr_x,tr_y) and (x,y) from the other
+            # function to revert the projection
+            tr_pixels[x_coord, y_coord] = org_pixels[tr_x, tr_y]
+
+    tr_img = tr_img.rotate(270)
+
+    if palette:
+        tr_img = tr_img.quantize(colors=256, palette=Image.open(palette))
+
+    return tr_img
+
+def save_transformed(img, palette, filename, raw=False):
+    """
+    Writes the transformed result to file and returns its filename.
+
+    If raw is set, the result is written as uncompressed raw frame.
+    """
+
+    # Use this for debugging:
+    # img.show()
+
+    if raw:
+        if palette:
+            raise AssetError("Legacy mode images can not be stored as raw frames")
+
+        output_name = filename + rawframe.RAW_EXTENSION
+        rawframe.write_image(output_name, img)
+        return output_name
+
+    if palette:
+        output_name = filename + ".bmp"
+        file_format = "BMP"
+    else:
+        output_name = filename + ".png"
+        file_format = "PNG"
+
+    try:
+        img.save(output_name, file_format)
+    except IOError as error:
+        raise AssetError("File %s could not be written" % output_name) from error
+
+    return output_name
@@ -0,0 +1,135 @@
+# Copyright 2019-2019 the openage authors. See copying.md for legal info.
+
+"""
+Camera math for create_sprites.py.
+
+Only NumPy is required, so the functions can be used and tested
+outside of Blender.
+"""
+
+from math import radians
+import numpy
+
+
+# Tilt of the dimetric camera around its x axis
+DIMETRIC_TILT = 60
+
+
+def rotation_x(angle):
+    """
+    Return the rotation matrix around the x axis (angle in radians).
+    """
+
+    cos, sin = numpy.cos(angle), numpy.sin(angle)
+
+    return numpy.array([[1.0, 0.0, 0.0],
+                        [0.0, cos, -sin],
+                        [0.0, sin, cos]])
+
+
+def rotation_z(angle):
+    """
+    Return the rotation matrix around the z axis (angle in radians).
+    """
+
+    cos, sin = numpy.cos(angle), numpy.sin(angle)
+
+    return numpy.array([[cos, -sin, 0.0],
+                        [sin, cos, 0.0],
+                        [0.0, 0.0, 1.0]])
+
+
+def transform_bounds(coords, matrix):
+    """
+    Transform an (n, 3) array of local coordinates with a 4x4
+    world matrix and return the lowest and highest coordinates.
+    """
+
+    if len(coords) == 0:
+        return numpy.zeros(3), numpy.zeros(3)
+
+    world_coords = coords @ matrix[:3, :3].T + matrix[:3, 3]
+
+    return world_coords.min(axis=0), world_coords.max(axis=0)
+
+
+def bounds_extent(lowest, highest, center):
+    """
+    Return the largest distance from the center to the bounds
+    for every axis.
+    """
+
+    center = numpy.array(center, dtype=numpy.float64)
+
+    return tuple(numpy.maximum(numpy.abs(highest - center),
+                               numpy.abs(lowest - center)))
+
+
+def box_corners(half_dims):
+    """
+    Return the eight corners of a box centered on the origin.
+    """
+
+    signs = numpy.array([(x, y, z) for x in (-1, 1) for y in (-1, 1) for z in (-1, 1)],
+                        dtype=numpy.float64)
+
+    return signs * numpy.array(half_dims, dtype=numpy.float64)
+
+
+def fit_orthographic_camera(half_dims, camera_rotation_z, angles, resolution):
+    """
+    Compute the orthographic scale needed to fit a box centered
+    on the pivot for every pivot angle (in degrees).
+
+    The camera is parented to the pivot and rotated by the dimetric
+    tilt and camera_rotation_z (in radians). Returns the scales and
+    the (x, y) centers of the projected box in camera space, one
+    row per angle.
+    """
+
+    corners = box_corners(half_dims)
+    camera_rotation = rotation_z(camera_rotation_z) @ rotation_x(radians(DIMETRIC_TILT))
+
+    # Camera right and up axes in world space for every angle.
+    # Rotating the pivot by an angle rotates the camera axes with it.
+    angles = numpy.radians(numpy.asarray(angles, dtype=numpy.float64))
+    pivot_rotations = numpy.stack([rotation_z(angle) for angle in angles])
+    camera_axes = pivot_rotations @ camera_rotation
+
+    # Projections of all corners on the right and up axes: (angles, corners)
+    proj_x = numpy.einsum("kj,aj->ak", corners, camera_axes[:, :, 0])
+    proj_y = numpy.einsum("kj,aj->ak", corners, camera_axes[:, :, 1])
+
+    width = proj_x.max(axis=1) - proj_x.min(axis=1)
+    height = proj_y.max(axis=1) - proj_y.min(axis=1)
+
+    centers = numpy.stack([(proj_x.max(axis=1) + proj_x.min(axis=1)) / 2,
+                           (proj_y.max(axis=1) + proj_y.min(axis=1)) / 2], axis=1)
+
+    # Blender applies the orthographic scale to the longer side
+    # of the render resolution.
+    res_x, res_y = resolution
+    if res_x >= res_y:
+        scales = numpy.maximum(width, height * res_x / res_y)
+    else:
+        scales = numpy.maximum(width * res_y / res_x, height)
+
+    return scales, centers
+
+
+def camera_location(half_dims, camera_rotation_z, center):
+    """
+    Return the camera location relative to the pivot that looks at
+    the projected center of the box from outside of it.
+    """
+
+    camera_rotation = rotation_z(camera_rotation_z) @ rotation_x(radians(DIMETRIC_TILT))
+
+    # The camera looks along its negative z axis
+    distance = numpy.linalg.norm(half_dims) + 1.0
+
+    location = (center[0] * camera_rotation[:, 0] +
+                center[1] * camera_rotation[:, 1] +
+                distance * camera_rotation[:, 2])
+
+    return tuple(float(value) for value in location), float(distance)
@@ -9,6 +9,17 @@
 #          --armature <armature-name> \
 #          --resolution WIDTHxHEIGHT \
 #          --legacy \
+#          --bounds-sampling all|rendered|coarse \
+#          --no-bounds-cache \
+#          --frame-slice START:END \
+#          --angle-slice START:END \
+#          --no-resume \
+#          --layers <view-layer-names> \
+#          --batched \
+#          --preview \
+#          --direct-sheet \
+#          --alpha-threshold <threshold> \
+#          --raw-frames \
 #
 
 """
@@ -18,8 +29,26 @@ Script for creating sprites from a blender model.
 from math import radians, ceil
 import sys
 import argparse
+from collections import OrderedDict
+import hashlib
+import json
+import os
 import time
 import bpy
+import numpy
+
+# Blender does not add the script's folder to the module path.
+# The assettools package is in the parent folder.
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+# pylint: disable=wrong-import-position
+from camera_fit import (bounds_extent, camera_location, fit_orthographic_camera,
+                        transform_bounds)
+from render_plan import (animation_frames, build_render_plan, filter_plan, frame_runs,
+                         render_angles, unique_renders, write_render_plan)
+from assettools.fileutil import atomic_write
+from assettools.rawframe import RAW_EXTENSION, write_raw_frame
 
 
 def main():
@@ -65,15 +94,79 @@ def main():
 
     selected_nla_tracks, all_nla_tracks = get_nla_tracks(track_names, armature)
 
+    if args.list_tracks:
+        # Machine-readable output for render_orchestrator.py
+        print("TRACKS %s" % json.dumps([track.name for track in selected_nla_tracks]))
+        return
+
+    angle_slice = parse_slice(args.angle_slice)
+    frame_slice = parse_slice(args.frame_slice)
+
+    if args.direct_sheet and (angle_slice is not None or frame_slice is not None):
+        exit_blender("Spritesheets can only be created directly from complete tracks.")
+
+    if args.layers is None:
+        layer_names = list()
+    else:
+        layer_names = str(args.layers).split(",")
+
+    if args.direct_sheet and layer_names:
+        exit_blender("Additional layers can not be used with direct spritesheets.")
+
+    if args.direct_sheet and args.batched:
+        exit_blender("Direct spritesheets can not be rendered in batched mode.")
+
+    if args.raw_frames and (args.direct_sheet or args.batched or layer_names):
+        exit_blender("Raw frames can not be combined with direct spritesheets, "
+                     "batched mode or additional layers.")
+
     pivot_point = find_centroid(model_collection)
 
     pivot = create_camera(pivot_point)
 
     scene_config(resolution)
 
-    position_camera(model_collection, pivot, all_nla_tracks, angle_count)
+    blend_hash = None
+    if bpy.data.filepath:
+        blend_hash = file_hash(bpy.data.filepath)
+
+    lowest, highest = get_animation_bounds(model_collection, all_nla_tracks,
+                                           args.bounds_sampling, animation_frame_count,
+                                           args.coarse_step,
+                                           None if args.no_bounds_cache else blend_hash)
+
+    if args.bounds_only:
+        print("Finished bounds in %.4f seconds" % (time.time() - time_start))
+        return
 
-    render_animations(pivot, selected_nla_tracks, angle_count, animation_frame_count, legacy_mode)
+    position_camera(pivot, lowest, highest, angle_count)
+
+    if args.preview:
+        preview_config(args.preview_scale, args.preview_engine)
+        setup_viewer_node()
+        render_preview(pivot, selected_nla_tracks, angle_count, animation_frame_count,
+                       legacy_mode, args.preview_frames, args.preview_angles)
+
+        print("Finished preview in %.4f seconds" % (time.time() - time_start))
+        return
+
+    manifest_params = None
+    if blend_hash is not None and not args.no_resume and not args.direct_sheet:
+        manifest_params = render_params(args, blend_hash)
+
+    sheet_threshold = None
+    if args.direct_sheet:
+        setup_viewer_node()
+        sheet_threshold = args.alpha_threshold
+
+    if args.raw_frames:
+        setup_viewer_node()
+
+    layer_outputs = setup_layer_outputs(layer_names)
+
+    render_animations(pivot, selected_nla_tracks, angle_count, animation_frame_count, legacy_mode,
+                      frame_slice, angle_slice, manifest_params, sheet_threshold, layer_outputs,
+                      args.batched, args.raw_frames)
 
     print("Finished in %.4f seconds" % (time.time() - time_start))
 
@@ -124,7 +217,77 @@ def parse_args():
     parser.add_argument("--resolution", default="300x300", type=str,
                         help=("target resolution for one rendered image;"
                               "inputs as WIDTHxHEIGHT ; default = 1280x720"))
-    return parser.parse_args(argv)
+    parser.add_argument("--bounds-sampling", default="all", choices=("all", "rendered", "coarse"),
+                        help=("frames tested for the camera bounding box: every frame, "
+                              "only rendered frames or coarse-to-fine; default = all"))
+    parser.add_argument("--coarse-step", default=4, type=int,
+                        help=("frame step of the coarse bounds sampling; default = 4"))
+    parser.add_argument("--no-bounds-cache", default=False, action='store_true',
+                        help=("do not read or write the cached animation bounds"))
+    parser.add_argument("--frame-slice", type=str,
+                        help=("only render the frames with an index in START:END"))
+    parser.add_argument("--angle-slice", type=str,
+                        help=("only render the angles with an index in START:END"))
+    parser.add_argument("--no-resume", default=False, action='store_true',
+                        help=("render all frames, even if valid outputs from an "
+                              "earlier run exist"))
+    parser.add_argument("-l", "--layers", type=str,
+                        help=("additional view layers rendered as sprite layers, e.g. "
+                              "shadows; separate with ,"))
+    parser.add_argument("--batched", default=False, action='store_true',
+                        help=("render each angle as animation instead of "
+                              "rendering every frame on its own; only faster if "
+                              "the track length is a multiple of the frame count, "
+                              "so that the rendered frames are evenly spaced"))
+    parser.add_argument("--direct-sheet", default=False, action='store_true',
+                        help=("create the spritesheets in memory instead of writing "
+                              "single images; requires Pillow in Blender's Python; "
+                              "forces the Standard view transform without look"))
+    parser.add_argument("--alpha-threshold", default=0, type=int,
+                        help=("threshold for the alpha channel of the direct "
+                              "spritesheets; default = 0"))
+    parser.add_argument("--raw-frames", default=False, action='store_true',
+                        help=("write uncompressed .rgba frames instead of PNG; "
+                              "sprite_merge.py reads them without decoding; "
+                              "forces the Standard view transform without look"))
+    parser.add_argument("--preview", default=False, action='store_true',
+                        help=("render a few frames and angles with cheap settings "
+                              "into a contact sheet to check the camera framing; "
+                              "requires Pillow in Blender's Python; "
+                              "uses the Standard view transform"))
+    parser.add_argument("--preview-frames", default=3, type=int,
+                        help=("number of frames per track in the preview; default = 3"))
+    parser.add_argument("--preview-angles", default=4, type=int,
+                        help=("number of angles in the preview; default = 4"))
+    parser.add_argument("--preview-scale", default=25, type=int,
+                        help=("resolution of the preview in percent; default = 25"))
+    parser.add_argument("--preview-engine", default="BLENDER_WORKBENCH", type=str,
+                        help=("render engine of the preview; default = BLENDER_WORKBENCH"))
+    parser.add_argument("--list-tracks", default=False, action='store_true',
+                        help=("print the names of the selected tracks and exit"))
+    parser.add_argument("--bounds-only", default=False, action='store_true',
+                        help=("only compute and cache the animation bounds"))
+    args = parser.parse_args(argv)
+
+    if args.coarse_step < 1:
+        exit_blender("The coarse step has to be at least 1.")
+
+    return args
+
+
+def parse_slice(raw_slice):
+    """
+    Turn a START:END argument into a range of indices.
+    """
+
+    if raw_slice is None:
+        return None
+
+    try:
+        start, end = raw_slice.split(":")
+        return range(int(start), int(end))
+    except ValueError:
+        exit_blender("%s is not an accepted slice." % (raw_slice))
 
 
 def get_models(model_names):
@@ -253,49 +416,57 @@ def create_camera(pivot_point):
     return pivot
 
 
-def position_camera(models, pivot, nla_tracks, angle_count):
+def get_animation_bounds(models, nla_tracks, sampling, frame_count, coarse_step, blend_hash):
     """
-    Find the optimal position for the camera.
+    Find the lowest and highest coordinates reached by the models
+    in all animations.
 
-    The script iterates through all animations to find
-    a "bounding box" in that all models fit, regardless
-    of frame and animation. The camera is positioned
-    to center the bounding box at all times.
+    If the content hash of the .blend file is given, the result is
+    stored in a cache file next to it, so that later runs on the same
+    file and selection can skip the scene evaluation entirely.
     """
 
-    # Vertices of the bounding box
-    vertices = [(0, 0, 0), (0, 1, 0), (1, 0, 0), (1, 1, 0),
-                (0, 0, 1), (0, 1, 1), (1, 0, 1), (1, 1, 1)]
+    cache_path = None
+    cache_key = None
+
+    if blend_hash is not None:
+        cache_path = os.path.splitext(bpy.path.abspath(bpy.data.filepath))[0] + "_bounds.json"
+        cache_key = bounds_cache_key(blend_hash,
+                                     [track.name for track in nla_tracks],
+                                     [model.name for model in models.all_objects],
+                                     sampling, frame_count, coarse_step)
 
-    # Faces of the bounding box: bottom, top, x_left, x_right, y_left, y_right
-    faces = [(0, 1, 3, 2), (4, 5, 7, 6), (0, 1, 5, 4),
-             (2, 3, 7, 6), (0, 2, 6, 4), (1, 3, 7, 5)]
+        cached_bounds = load_cached_bounds(cache_path, cache_key)
+        if cached_bounds is not None:
+            print("Using cached animation bounds from %s" % cache_path)
+            return cached_bounds
 
-    # Create bounding box in scene
-    bb_mesh = bpy.data.meshes.new("Bounding Box")
-    bounding_box = bpy.data.objects.new("Bounding Box", bb_mesh)
-    bounding_box.location = (0, 0, 0)
-    bpy.context.scene.collection.objects.link(bounding_box)
-    bb_mesh.from_pydata(vertices, [], faces)
-    bb_mesh.update(calc_edges=True)
-    bounding_box.display_type = 'WIRE'
+    lowest, highest = scan_animation_bounds(models, nla_tracks, sampling,
+                                            frame_count, coarse_step)
+
+    if cache_path is not None:
+        store_cached_bounds(cache_path, cache_key, lowest, highest)
+
+    return lowest, highest
+
+
+def scan_animation_bounds(models, nla_tracks, sampling, frame_count, coarse_step):
+    """
+    Evaluate the animations frame by frame and return the most
+    extreme coordinates of all models.
+
+    With sampling "all", every frame of every track is tested.
+    "rendered" only tests the frames that render_animations()
+    will render. "coarse" tests every n-th frame and then every
+    frame around the ones where a new extreme was found.
+    """
 
     scene = bpy.context.scene
-    camera = scene.camera
 
     # Use these variables to save the most extreme coordinates
     # found for the animation.
-    highest_x = 0.0
-    highest_y = 0.0
-    highest_z = 0.0
-
-    lowest_x = 0.0
-    lowest_y = 0.0
-    lowest_z = 0.0
-
-    # Deselect all objects
-    for obj in bpy.data.objects:
-        obj.select_set(False)
+    highest = numpy.zeros(3)
+    lowest = numpy.zeros(3)
 
     for track in nla_tracks:
 
@@ -305,193 +476,447 @@ def position_camera(models, pivot, nla_tracks, angle_count):
         start_frame = scene.frame_start
         end_frame = ceil(track.strips[-1].frame_end)
 
-        # Test every frame
-        for frame in range(start_frame, end_frame + 1):
+        # Frame where each coordinate of the extremes was found
+        extreme_frames = set()
+        tested_frames = list()
 
+        def test_frame(frame):
             scene.frame_set(frame)
             scene.update()
+            tested_frames.append(frame)
 
             for model in models.all_objects:
 
-                # Copy the mesh at the current position of the frame
-                # and assign the copy to a new object.
-                # By doing this, we can extract the current location
-                # of the vertices in the meshes, which is otherwise
-                # impossible.
-                cur_mesh = model.to_mesh(bpy.context.depsgraph, True)
-                cur_mesh.transform(model.matrix_world)
-                pos_obj = bpy.data.objects.new("Test", cur_mesh)
-                bpy.context.scene.collection.objects.link(pos_obj)
-
-                # Search every vertex to find the most
-                # extreme coordinates in the animations
-                for vertex in pos_obj.data.vertices:
-
-                    location = vertex.co
-
-                    if location[0] > highest_x:
-                        highest_x = location[0]
-                    if location[1] > highest_y:
-                        highest_y = location[1]
-                    if location[2] > highest_z:
-                        highest_z = location[2]
-
-                    if location[0] < lowest_x:
-                        lowest_x = location[0]
-                    if location[1] < lowest_y:
-                        lowest_y = location[1]
-                    if location[2] < lowest_z:
-                        lowest_z = location[2]
-
-                # Delete the copied mesh
-                pos_obj.select_set(True)
-                bpy.ops.object.delete()
+                model_lowest, model_highest = model_bounds(model)
+
+                if (model_highest > highest).any() or (model_lowest < lowest).any():
+                    extreme_frames.add(frame)
+
+                numpy.maximum(highest, model_highest, out=highest)
+                numpy.minimum(lowest, model_lowest, out=lowest)
+
+        if sampling == "rendered":
+            frames = animation_frames(start_frame, end_frame, frame_count)
+        elif sampling == "coarse":
+            frames = list(range(start_frame, end_frame + 1, coarse_step))
+            if frames[-1] != end_frame:
+                frames.append(end_frame)
+        else:
+            frames = range(start_frame, end_frame + 1)
+
+        for frame in frames:
+            test_frame(frame)
+
+        if sampling == "coarse":
+            # Refine around the frames that moved the extremes
+            refine_frames = refine_sample_frames(extreme_frames, tested_frames,
+                                                 coarse_step, start_frame, end_frame)
+            for frame in refine_frames:
+                test_frame(frame)
 
         # Go back through the animation frame by frame. If we
         # don't do this, it can create problems with keyframe data.
-        frame = end_frame
-
-        while frame > start_frame - 1:
+        for frame in sorted(set(tested_frames) | {start_frame}, reverse=True):
 
             scene.frame_set(frame)
 
-            frame -= 1
-
         # Mute the track
         track.mute = True
 
-    # Calculate the distances between the pivot point
-    # and the extreme positions.
-    pivot_location = pivot.location
+    return lowest, highest
 
-    distance_highest_x = abs(highest_x - pivot_location.x)
-    distance_highest_y = abs(highest_y - pivot_location.y)
-    distance_highest_z = abs(highest_z - pivot_location.z)
 
-    distance_lowest_x = abs(lowest_x - pivot_location.x)
-    distance_lowest_y = abs(lowest_y - pivot_location.y)
-    distance_lowest_z = abs(lowest_z - pivot_location.z)
+def refine_sample_frames(extreme_frames, tested_frames, step, start_frame, end_frame):
+    """
+    Return all untested frames within one coarse step of the
+    frames where an extreme was found.
+    """
 
-    # The higher distance is chosen for the dimension
-    # of the bounding box.
-    if distance_highest_x > distance_lowest_x:
-        dim_x = distance_highest_x
-    else:
-        dim_x = distance_lowest_x
+    tested = set(tested_frames)
+    refine = set()
 
-    if distance_highest_y > distance_lowest_y:
-        dim_y = distance_highest_y
-    else:
-        dim_y = distance_lowest_y
+    for frame in extreme_frames:
+        for neighbour in range(max(start_frame, frame - step + 1),
+                               min(end_frame, frame + step - 1) + 1):
+            if neighbour not in tested:
+                refine.add(neighbour)
 
-    if distance_highest_z > distance_lowest_z:
-        dim_z = distance_highest_z
-    else:
-        dim_z = distance_lowest_z
+    return sorted(refine)
 
-    # Create the bounding box from the values we found
-    bounding_box.select_set(True)
-    bpy.ops.object.origin_set(type='ORIGIN_GEOMETRY')
-    bounding_box.location = pivot.location
 
-    bounding_box.dimensions = (2 * dim_x, 2 * dim_y, 2 * dim_z)
+def file_hash(path):
+    """
+    Return the SHA-256 hash of a file's content.
+    """
 
-    best_angle = 0
-    best_scale = 0.0
+    sha = hashlib.sha256()
 
-    angle = 0
-    angle_distance = 360 / angle_count
-    index = 0
+    with open(bpy.path.abspath(path), "rb") as infile:
+        for chunk in iter(lambda: infile.read(1 << 20), b""):
+            sha.update(chunk)
 
-    # Test every angle for the best camera position
-    while angle < (360 - angle_distance):
+    return sha.hexdigest()
 
-        angle = angle_distance * index
-        pivot.rotation_euler = (0, 0, radians(angle))
 
-        # Fits the view of the camera to all selected objects
-        bpy.ops.view3d.camera_to_view_selected()
+def bounds_cache_key(content_hash, track_names, model_names, sampling, frame_count, coarse_step):
+    """
+    Build the key under which the bounds of one selection are cached.
+    """
+
+    key = "%s|%s|%s|%s" % (content_hash,
+                           ",".join(sorted(track_names)),
+                           ",".join(sorted(model_names)),
+                           sampling)
 
-        # Since the angle is fixed, the camera scale should give indication of the
-        # farthest position away from the objects.
-        scale = camera.data.ortho_scale
+    if sampling == "rendered":
+        key += "|%i" % frame_count
+    elif sampling == "coarse":
+        key += "|%i" % coarse_step
 
-        if scale > best_scale:
+    return key
 
-            best_angle = angle
-            best_scale = scale
 
-        index += 1
+def load_cached_bounds(cache_path, cache_key):
+    """
+    Return the cached lowest and highest coordinates for a key
+    or None if they are not cached.
+    """
+
+    try:
+        with open(cache_path, "r") as cache_file:
+            cache = json.load(cache_file)
+    except (OSError, ValueError):
+        return None
+
+    entry = cache.get(cache_key)
+    if entry is None:
+        return None
 
-    # Go to the angle where the best camera position
-    # was found. Then adjust the camera to it.
-    pivot.rotation_euler = (0, 0, radians(best_angle))
-    bpy.ops.view3d.camera_to_view_selected()
+    return numpy.array(entry["lowest"]), numpy.array(entry["highest"])
 
-    # Set bounding box as invisible for renderer
-    bounding_box.hide_render = True
+
+def store_cached_bounds(cache_path, cache_key, lowest, highest):
+    """
+    Write the lowest and highest coordinates for a key to the cache.
+
+    Entries of older versions of the .blend file are dropped.
+    """
+
+    content_hash = cache_key.split("|")[0]
+
+    try:
+        with open(cache_path, "r") as cache_file:
+            cache = json.load(cache_file)
+    except (OSError, ValueError):
+        cache = dict()
+
+    cache = {key: value for key, value in cache.items()
+             if key.split("|")[0] == content_hash}
+
+    cache[cache_key] = {
+        "lowest": [float(value) for value in lowest],
+        "highest": [float(value) for value in highest],
+    }
+
+    # Parallel workers may write the cache at the same time,
+    # so the file is replaced in one step.
+    try:
+        with atomic_write(cache_path) as cache_file:
+            json.dump(cache, cache_file, indent=1)
+    except OSError:
+        print("Bounds cache %s could not be written" % cache_path)
+
+
+def position_camera(pivot, lowest, highest, angle_count):
+    """
+    Find the optimal position for the camera.
+
+    The lowest and highest coordinates found in all animations
+    describe a "bounding box" in that all models fit, regardless
+    of frame and animation. The camera is positioned
+    to center the bounding box at all times.
+
+    The fit is calculated by projecting the corners of the bounding
+    box for all angles at once, so no view operators are needed.
+    """
+
+    scene = bpy.context.scene
+    camera = scene.camera
+
+    # Calculate the distances between the pivot point
+    # and the extreme positions.
+    # The higher distance is chosen for the dimension
+    # of the bounding box.
+    half_dims = bounds_extent(lowest, highest, pivot.location)
+
+    camera_rotation_z = camera.rotation_euler[2]
+    resolution = (scene.render.resolution_x, scene.render.resolution_y)
+
+    angle_distance = 360 / angle_count
+    angles = [angle_distance * index for index in range(angle_count)]
+
+    # Since the angle is fixed, the camera scale should give indication of the
+    # farthest position away from the objects.
+    scales, centers = fit_orthographic_camera(half_dims, camera_rotation_z, angles, resolution)
+    best_index = int(scales.argmax())
+
+    # Adjust the camera to the angle where the best camera
+    # position was found.
+    location, distance = camera_location(half_dims, camera_rotation_z, centers[best_index])
+
+    camera.location = location
+    camera.data.ortho_scale = float(scales[best_index])
+    camera.data.clip_end = max(camera.data.clip_end, 2 * distance + 1.0)
 
     # Return to the starting position
     pivot.rotation_euler = (0, 0, 0)
 
 
-def render_frame(frame_num, pivot, track_name, angle_count, legacy):
+def model_bounds(model):
     """
-    Render one frame from all sides.
+    Find the lowest and highest world coordinates of a model's
+    vertices at the current frame.
+
+    The evaluated mesh is copied once and its vertex coordinates
+    are read in bulk, so no Python loop over the vertices is needed.
     """
 
-    filename = bpy.path.basename(bpy.data.filepath).split('.')[0]
+    # Copy the mesh at the current position of the frame.
+    # By doing this, we can extract the current location
+    # of the vertices in the meshes, which is otherwise
+    # impossible.
+    cur_mesh = model.to_mesh(bpy.context.depsgraph, True)
+
+    coords = numpy.empty(len(cur_mesh.vertices) * 3, dtype=numpy.float64)
+    cur_mesh.vertices.foreach_get("co", coords)
+
+    matrix = numpy.array(model.matrix_world, dtype=numpy.float64)
+
+    # Delete the copied mesh
+    bpy.data.meshes.remove(cur_mesh)
+
+    return transform_bounds(coords.reshape(-1, 3), matrix)
 
-    path = "//%s/%s/%s_" % (filename, track_name, str(frame_num).zfill(3))
+
+def render_frame(frame_num, pivot, output_root, items, manifest=None, sheet=None,
+                 layer_outputs=(), raw_frames=False):
+    """
+    Render one frame from all sides given by the render items.
+
+    Angles whose outputs are still valid according to
+    the manifest are skipped. If a spritesheet is given, the
+    render result is added to it instead of being written to a file.
+    The images of additional layers are written by their file
+    output nodes during the same render.
+
+    Raw frames are taken from the viewer node and written
+    without PNG compression.
+    """
 
     scene = bpy.context.scene
-    scene.frame_set(frame_num)
+    frame_is_set = False
 
-    angle = 0
-    angle_distance = 360 / angle_count
-    index = 0
+    for item in items:
 
-    # In legacy mode, only render half of the sprites
-    max_rotation = 360
-    if legacy:
-        max_rotation = 180 + angle_distance
+        output_path = output_root + item.path
+        output_paths = [output_path]
+        for name, _ in layer_outputs:
+            output_paths.append(layer_output_path(output_path, name))
 
-    while angle < (max_rotation - angle_distance):
+        if manifest is not None and all(manifest.is_valid(path) for path in output_paths):
+            continue
 
-        angle = angle_distance * index
-        pivot.rotation_euler = (0, 0, radians(angle))
+        if not frame_is_set:
+            scene.frame_set(frame_num)
+            frame_is_set = True
+
+        pivot.rotation_euler = (0, 0, radians(item.angle))
+
+        if sheet is not None:
+            bpy.ops.render.render()
+            sheet.add(viewer_image(), item.scene_frame, item.angle)
+            continue
+
+        if raw_frames:
+            bpy.ops.render.render()
+            write_raw_viewer(bpy.path.abspath(output_path), item.scene_frame, item.angle)
+
+            if manifest is not None:
+                manifest.add(output_path)
+            continue
 
-        scene.render.filepath = "%s%03i_%03.f.png" % (path, index, angle)
+        for name, output in layer_outputs:
+            # The file output node replaces ### with the current frame number
+            output.base_path = bpy.path.abspath(layer_output_dir(output_root + item.track, name))
+            output.file_slots[0].path = "###_%03i_%03.f" % (item.angle_index, item.angle)
+
+        scene.render.filepath = output_path
         bpy.ops.render.render(write_still=True)
 
-        index += 1
+        check_layer_outputs(output_paths)
+
+        if manifest is not None:
+            for path in output_paths:
+                manifest.add(path)
+
+    if manifest is not None and frame_is_set:
+        manifest.save()
 
 
-def render_animations(pivot, tracks, angle_count, animation_frame_count, legacy):
+def render_batched(pivot, output_root, track_name, items, manifest=None, layer_outputs=()):
     """
-    Renders the animations given NLA tracks.
+    Render the items of a track with one animation render per angle
+    and run of evenly spaced frames.
+
+    Frames are only evenly spaced if the track length is a multiple
+    of the frame count. Otherwise the rounded frames split into many
+    short runs and batching saves little, which is reported.
+
+    The output files are named like the ones of render_frame(),
+    Blender replaces ### with the frame number. Items whose outputs
+    are still valid according to the manifest are skipped.
+    """
+
+    scene = bpy.context.scene
+
+    # Scene frames that have to be rendered for every angle
+    angle_frames = OrderedDict()
+
+    for item in items:
+        output_path = output_root + item.path
+        output_paths = [output_path]
+        for name, _ in layer_outputs:
+            output_paths.append(layer_output_path(output_path, name))
+
+        if manifest is not None and all(manifest.is_valid(path) for path in output_paths):
+            continue
+
+        angle_frames.setdefault((item.angle_index, item.angle), list()).append(
+            (item.scene_frame, output_paths))
+
+    if not angle_frames:
+        return
+
+    frame_range = (scene.frame_start, scene.frame_end, scene.frame_step)
+    uneven_reported = False
+
+    for (angle_index, angle), frames in angle_frames.items():
+
+        pivot.rotation_euler = (0, 0, radians(angle))
+
+        name_pattern = "###_%03i_%03.f" % (angle_index, angle)
+        scene.render.filepath = "%s%s/%s" % (output_root, track_name, name_pattern)
+
+        for name, output in layer_outputs:
+            output.base_path = bpy.path.abspath(layer_output_dir(output_root + track_name, name))
+            output.file_slots[0].path = name_pattern
+
+        runs = frame_runs(sorted(frame for frame, _ in frames))
+
+        if len(runs) > 1 and not uneven_reported:
+            print("Frames of track %s are not evenly spaced, rendering %i frames "
+                  "in %i animation renders per angle" % (track_name, len(frames), len(runs)))
+            uneven_reported = True
+
+        for first, last, step in runs:
+            scene.frame_start = first
+            scene.frame_end = last
+            scene.frame_step = step
+
+            bpy.ops.render.render(animation=True)
+
+        for _, output_paths in frames:
+            check_layer_outputs(output_paths)
+
+        if manifest is not None:
+            for _, output_paths in frames:
+                for path in output_paths:
+                    manifest.add(path)
+            manifest.save()
+
+    scene.frame_start, scene.frame_end, scene.frame_step = frame_range
+
+
+def render_animations(pivot, tracks, angle_count, animation_frame_count, legacy,
+                      frame_slice=None, angle_slice=None, manifest_params=None,
+                      sheet_threshold=None, layer_outputs=(), batched=False,
+                      raw_frames=False):
     """
+    Renders the animations given NLA tracks.
+
+    The render plan of every track is computed up front and
+    written next to its images. Scene frames that are used for
+    several animation frames are only rendered once.
 
-    animation_frames = animation_frame_count
+    Frame and angle slices restrict the rendering to the frames
+    and angles with an index in the slice. If manifest parameters
+    are given, a render manifest is kept for every track and
+    outputs that are still valid are not rendered again.
+
+    If a transparency threshold for spritesheets is given, the
+    spritesheet and .sprite file of every track are created
+    directly from the render results. Additional layers are
+    rendered together with the main layer.
+
+    In batched mode, every angle of a track is rendered with
+    animation renders over runs of evenly spaced frames.
+    With raw_frames, the images are written as uncompressed
+    raw frames.
+    """
 
     scene = bpy.context.scene
+    root = output_root()
+
+    start_frame = scene.frame_start
+    track_ranges = [(track.name, start_frame, ceil(track.strips[-1].frame_end))
+                    for track in tracks]
+
+    plan = build_render_plan(track_ranges, angle_count, animation_frame_count, legacy,
+                             RAW_EXTENSION if raw_frames else ".png")
+    renders = unique_renders(filter_plan(plan, frame_slice, angle_slice))
 
     for track in tracks:
 
+        # Direct spritesheets do not have single images
+        if sheet_threshold is None:
+            write_render_plan(plan, track.name,
+                              bpy.path.abspath("%s%s/render_plan.json" % (root, track.name)))
+
         track.mute = False
 
-        start_frame = scene.frame_start
-        end_frame = ceil(track.strips[-1].frame_end)
+        manifest = None
+        if manifest_params is not None:
+            manifest = RenderManifest("%s%s" % (root, track.name),
+                                      manifest_slice_name(frame_slice, angle_slice),
+                                      manifest_params)
 
-        frame_distance = (end_frame - start_frame) / (animation_frames - 1)
+        sheet = None
+        if sheet_threshold is not None:
+            sheet = DirectSpritesheet("%s%s_animation.png" % (root, track.name), sheet_threshold)
 
-        for index in range(animation_frames):
+        frame = start_frame
 
-            rendered_frame = start_frame + int(index * frame_distance)
+        if batched:
+            track_items = list()
+            for (track_name, _), items in renders.items():
+                if track_name == track.name:
+                    track_items.extend(items)
 
-            render_frame(rendered_frame, pivot, track.name, angle_count, legacy)
+            render_batched(pivot, root, track.name, track_items, manifest, layer_outputs)
 
-        frame = rendered_frame
+        else:
+            for (track_name, scene_frame), items in renders.items():
+
+                if track_name != track.name:
+                    continue
+
+                render_frame(scene_frame, pivot, root, items, manifest, sheet, layer_outputs,
+                             raw_frames)
+
+                frame = scene_frame
+
+        if sheet is not None:
+            sheet.write()
 
         # Reset scene
         while frame > start_frame - 1:
@@ -503,6 +928,532 @@ def render_animations(pivot, tracks, angle_count, animation_frame_count, legacy)
         track.mute = True
 
 
+def preview_config(scale, engine):
+    """
+    Sets up cheap render parameters for a preview.
+    """
+
+    scene = bpy.context.scene
+
+    scene.render.resolution_percentage = scale
+    scene.render.engine = engine
+
+    if engine == 'BLENDER_EEVEE':
+        scene.eevee.taa_render_samples = 1
+    elif engine == 'CYCLES':
+        scene.cycles.samples = 1
+    elif engine == 'BLENDER_WORKBENCH':
+        scene.display.render_aa = 'OFF'
+
+
+def render_preview(pivot, tracks, angle_count, animation_frame_count, legacy,
+                   preview_frame_count, preview_angle_count):
+    """
+    Render a subset of the frames and angles of all tracks into
+    a contact sheet.
+
+    Every row of the sheet shows one frame of a track from the
+    selected angles. The render times are written next to the sheet.
+    """
+
+    try:
+        import PIL  # pylint: disable=unused-import
+    except ImportError:
+        exit_blender("Pillow is required for --preview. Install it for "
+                     "Blender's Python with: <blender-python> -m pip install pillow")
+
+    scene = bpy.context.scene
+    root = output_root()
+
+    start_frame = scene.frame_start
+    track_ranges = [(track.name, start_frame, ceil(track.strips[-1].frame_end))
+                    for track in tracks]
+
+    plan = build_render_plan(track_ranges, angle_count, animation_frame_count, legacy)
+
+    angle_total = len(render_angles(angle_count, legacy))
+    frame_subset = set(animation_frames(0, animation_frame_count - 1, preview_frame_count))
+    angle_subset = set(animation_frames(0, angle_total - 1, preview_angle_count))
+
+    renders = unique_renders(filter_plan(plan, frame_subset, angle_subset))
+
+    rows = list()
+    timings = list()
+
+    for track in tracks:
+
+        track.mute = False
+
+        for (track_name, scene_frame), items in renders.items():
+
+            if track_name != track.name:
+                continue
+
+            scene.frame_set(scene_frame)
+            row = list()
+
+            for item in items:
+                pivot.rotation_euler = (0, 0, radians(item.angle))
+
+                render_start = time.time()
+                bpy.ops.render.render()
+                render_time = time.time() - render_start
+
+                # Same colours as the PNG of a full render
+                row.append(float_to_rgba8(viewer_pixels()))
+                timings.append({
+                    "track": track_name,
+                    "scene_frame": scene_frame,
+                    "angle": item.angle,
+                    "seconds": round(render_time, 4),
+                })
+
+            rows.append(row)
+
+        scene.frame_set(start_frame)
+        track.mute = True
+
+    pivot.rotation_euler = (0, 0, 0)
+
+    if not rows:
+        exit_blender("No frames selected for the preview.")
+
+    sheet_path = bpy.path.abspath(root + "preview.png")
+    write_contact_sheet(rows, sheet_path)
+
+    total_time = sum(timing["seconds"] for timing in timings)
+    with open(sheet_path[:-4] + ".json", "w") as timing_file:
+        json.dump({"renders": timings, "seconds": round(total_time, 4)}, timing_file, indent=1)
+
+    print("Preview of %i images rendered in %.4f seconds: %s" % (len(timings), total_time,
+                                                                 sheet_path))
+
+
+def write_contact_sheet(rows, path):
+    """
+    Write rows of 8-bit RGBA pixel arrays (origin at the top) as one PNG.
+    """
+
+    from PIL import Image
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    Image.fromarray(contact_sheet(rows), 'RGBA').save(path, "PNG")
+
+
+def contact_sheet(rows):
+    """
+    Arrange rows of equally sized pixel arrays in a grid.
+    """
+
+    height, width = rows[0][0].shape[0:2]
+    column_count = max(len(row) for row in rows)
+
+    sheet = numpy.zeros((height * len(rows), width * column_count, 4), dtype=numpy.uint8)
+
+    for row_index, row in enumerate(rows):
+        for column_index, pixels in enumerate(row):
+            sheet[row_index * height:(row_index + 1) * height,
+                  column_index * width:(column_index + 1) * width] = pixels
+
+    return sheet
+
+
+def setup_viewer_node():
+    """
+    Connect a viewer node to the render layers in the compositor,
+    so that render results can be read without writing a file.
+
+    The viewer node holds scene-linear pixels without the view
+    transform, so the Standard view transform is forced. Then
+    float_to_rgba8() produces the colours a rendered PNG has.
+    """
+
+    view_settings = bpy.context.scene.view_settings
+    view_settings.view_transform = 'Standard'
+    view_settings.look = 'None'
+    view_settings.exposure = 0.0
+    view_settings.gamma = 1.0
+    bpy.context.scene.display_settings.display_device = 'sRGB'
+
+    tree, layers = setup_compositor()
+
+    viewer = tree.nodes.new('CompositorNodeViewer')
+    viewer.use_alpha = True
+    tree.links.new(layers.outputs['Image'], viewer.inputs['Image'])
+
+
+def setup_layer_outputs(view_layer_names):
+    """
+    Add a file output to the compositor for every additional
+    view layer, so that all layers are written by one render.
+
+    Returns the file output node of each view layer.
+    """
+
+    if not view_layer_names:
+        return list()
+
+    scene = bpy.context.scene
+    tree = setup_compositor()[0]
+
+    # Render all view layers in one go
+    scene.render.use_single_layer = False
+
+    layer_outputs = list()
+
+    for name in view_layer_names:
+        view_layer = scene.view_layers.get(name)
+        if view_layer is None:
+            exit_blender("No view layer with name \"%s\" found" % (name))
+
+        view_layer.use = True
+
+        layers = tree.nodes.new('CompositorNodeRLayers')
+        layers.layer = name
+
+        output = tree.nodes.new('CompositorNodeOutputFile')
+        output.format.file_format = 'PNG'
+        output.format.color_mode = 'RGBA'
+        tree.links.new(layers.outputs['Image'], output.inputs[0])
+
+        layer_outputs.append((name, output))
+
+    return layer_outputs
+
+
+def layer_output_dir(track_dir, layer_name):
+    """
+    Return the folder the images of an additional layer are
+    written to, a subfolder of the folder of the track.
+    """
+
+    return "%s/%s" % (track_dir, layer_name)
+
+
+def layer_output_path(output_path, layer_name):
+    """
+    Return the path of an image of an additional layer, which is
+    stored in a subfolder next to the image of the main layer.
+    """
+
+    directory, filename = output_path.rsplit("/", 1)
+
+    return "%s/%s" % (layer_output_dir(directory, layer_name), filename)
+
+
+def check_layer_outputs(output_paths):
+    """
+    Check that the file output nodes wrote the images of the
+    additional layers to the paths the manifest and sprite_merge.py
+    expect. output_paths are the path of the main layer followed by
+    the paths of the additional layers.
+    """
+
+    for path in output_paths[1:]:
+        if not os.path.isfile(bpy.path.abspath(path)):
+            exit_blender("The layer image %s was not written" % path)
+
+
+def setup_compositor():
+    """
+    Enable the compositor and return its node tree and the
+    render layers node of the main view layer.
+    """
+
+    scene = bpy.context.scene
+    scene.use_nodes = True
+    tree = scene.node_tree
+
+    layers = None
+    composite = None
+    for node in tree.nodes:
+        if node.type == 'R_LAYERS':
+            layers = node
+        elif node.type == 'COMPOSITE':
+            composite = node
+
+    if layers is None:
+        layers = tree.nodes.new('CompositorNodeRLayers')
+
+    # Without a composite output, the compositor is not executed
+    if composite is None:
+        composite = tree.nodes.new('CompositorNodeComposite')
+        tree.links.new(layers.outputs['Image'], composite.inputs['Image'])
+
+    return tree, layers
+
+
+def viewer_image():
+    """
+    Return the last render result from the viewer node as RGBA image.
+    """
+
+    from PIL import Image
+
+    return Image.fromarray(float_to_rgba8(viewer_pixels()), 'RGBA')
+
+
+def viewer_pixels():
+    """
+    Return the float pixels of the last render result from the viewer
+    node with shape (height, width, 4) and the origin at the bottom.
+    """
+
+    viewer = bpy.data.images['Viewer Node']
+    width, height = viewer.size
+
+    pixels = numpy.empty(width * height * 4, dtype=numpy.float32)
+    viewer.pixels.foreach_get(pixels)
+
+    return pixels.reshape(height, width, 4)
+
+
+def write_raw_viewer(path, scene_frame, angle):
+    """
+    Write the last render result from the viewer node as raw frame.
+    """
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    pixels = float_to_rgba8(viewer_pixels())
+    height, width = pixels.shape[:2]
+
+    # Same angle value as sprite_merge.py reads from the filename
+    write_raw_frame(path, (width, height), pixels, angle=int("%.f" % angle), frame=scene_frame)
+
+
+def float_to_rgba8(pixels):
+    """
+    Convert premultiplied linear float pixels with the origin at the
+    bottom to straight sRGB 8-bit pixels with the origin at the top,
+    like they are stored in a rendered PNG.
+    """
+
+    pixels = numpy.clip(pixels[::-1], 0.0, 1.0)
+
+    alpha = pixels[..., 3:4]
+    color = numpy.divide(pixels[..., :3], alpha,
+                         out=numpy.zeros_like(pixels[..., :3]), where=alpha > 0)
+    color = numpy.clip(color, 0.0, 1.0)
+
+    color = numpy.where(color <= 0.0031308,
+                        color * 12.92,
+                        1.055 * numpy.power(color, 1 / 2.4) - 0.055)
+
+    result = numpy.concatenate((color, alpha), axis=2)
+
+    return (result * 255 + 0.5).astype(numpy.uint8)
+
+
+class DirectSpritesheet:
+    """
+    Spritesheet of one track that is filled with render results.
+
+    The frames are processed like by sprite_merge.py, but without
+    writing and reading single images. Pillow has to be installed
+    in Blender's Python for this.
+    """
+
+    def __init__(self, filename, transparency_threshold):
+        try:
+            import PIL  # pylint: disable=unused-import
+        except ImportError:
+            exit_blender("Pillow is required for --direct-sheet. Install it for "
+                         "Blender's Python with: <blender-python> -m pip install pillow")
+
+        from assettools import sprites
+
+        self.sprites = sprites
+        self.filename = bpy.path.abspath(filename)
+        self.transparency_threshold = transparency_threshold
+        self.builder = sprites.SpritesheetBuilder()
+        self.im_meta_list = list()
+
+    def add(self, image, scene_frame, angle):
+        """
+        Cut out a render result and place it in the spritesheet.
+        """
+
+        if self.transparency_threshold > 0:
+            image = self.sprites.correct_alpha(image, self.transparency_threshold)
+
+        cut_out_im, offset_hotspot = self.sprites.cut_out(
+            image, self.sprites.find_hotspot(image))
+
+        # Same angle value as sprite_merge.py reads from the filename
+        meta_info = [int("%.f" % angle), scene_frame, offset_hotspot[0], offset_hotspot[1]]
+
+        self.builder.add(cut_out_im, meta_info)
+        self.im_meta_list.append(meta_info)
+
+    def write(self):
+        """
+        Save the spritesheet and its .sprite file.
+        """
+
+        directory = os.path.dirname(self.filename)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        spritesheet, frame_infos = self.builder.build()
+        self.sprites.write_spritesheet(self.filename, spritesheet,
+                                       self.im_meta_list, frame_infos)
+
+
+def output_root():
+    """
+    Return the Blender path of the folder all images are written to.
+    """
+
+    filename = bpy.path.basename(bpy.data.filepath).split('.')[0]
+
+    return "//%s/" % filename
+
+
+def render_params(args, blend_hash):
+    """
+    Collect everything that changes the content of the rendered images.
+    """
+
+    params = {
+        "blend_hash": blend_hash,
+        "angles": args.angles,
+        "models": args.models,
+        "armature": args.armature,
+        "resolution": args.resolution,
+        "layers": args.layers,
+        "bounds_sampling": args.bounds_sampling,
+    }
+
+    # The camera fit depends on the sampled frames
+    if args.bounds_sampling == "rendered":
+        params["frames"] = args.frames
+    elif args.bounds_sampling == "coarse":
+        params["coarse_step"] = args.coarse_step
+
+    return params
+
+
+class RenderManifest:
+    """
+    Record of the images rendered for one track.
+
+    It stores the parameters of the render and the content hash
+    of every output, so an interrupted or repeated run can skip
+    the images that are still valid.
+
+    Parallel workers render different slices of a track. Every
+    slice has its own manifest file render_manifest_<slice>.json,
+    so that no worker overwrites the entries of another one. The
+    outputs of all manifest files of the track are read.
+    """
+
+    def __init__(self, directory, slice_name, params):
+        self.directory = bpy.path.abspath(directory)
+        self.path = os.path.join(self.directory, "render_manifest_%s.json" % slice_name)
+        self.params = params
+
+        # Outputs recorded by this worker, which are written to its file
+        self.outputs = self.read_outputs(self.path)
+
+        # Content hashes of every output recorded in any manifest of the track
+        self.recorded = dict()
+
+        try:
+            filenames = sorted(os.listdir(self.directory))
+        except OSError:
+            filenames = list()
+
+        for filename in filenames:
+            if filename.startswith("render_manifest") and filename.endswith(".json"):
+                outputs = self.read_outputs(os.path.join(self.directory, filename))
+                for key, content_hash in outputs.items():
+                    self.recorded.setdefault(key, set()).add(content_hash)
+
+    def read_outputs(self, path):
+        """
+        Return the outputs recorded in a manifest file if it was
+        written with the same parameters.
+        """
+
+        try:
+            with open(path, "r") as manifest_file:
+                content = json.load(manifest_file)
+        except (OSError, ValueError):
+            return dict()
+
+        if content.get("params") != self.params:
+            return dict()
+
+        return content.get("outputs", dict())
+
+    def is_valid(self, output_path):
+        """
+        Check if an output exists and is unchanged since it was rendered.
+        """
+
+        key = self.key(output_path)
+        recorded_hashes = self.recorded.get(key, set())
+
+        if key in self.outputs:
+            recorded_hashes = recorded_hashes | {self.outputs[key]}
+
+        if not recorded_hashes:
+            return False
+
+        try:
+            return file_hash(output_path) in recorded_hashes
+        except OSError:
+            return False
+
+    def add(self, output_path):
+        """
+        Record a rendered output.
+        """
+
+        self.outputs[self.key(output_path)] = file_hash(output_path)
+
+    def key(self, output_path):
+        """
+        Return the path of an output relative to the manifest.
+        """
+
+        return os.path.relpath(bpy.path.abspath(output_path),
+                               self.directory).replace(os.sep, "/")
+
+    def save(self):
+        """
+        Write the outputs recorded by this worker to its manifest file.
+        """
+
+        try:
+            with atomic_write(self.path) as manifest_file:
+                json.dump({"params": self.params, "outputs": self.outputs},
+                          manifest_file, indent=1, sort_keys=True)
+        except OSError:
+            print("Render manifest %s could not be written" % self.path)
+
+
+def manifest_slice_name(frame_slice, angle_slice):
+    """
+    Return the name of the render manifest of a frame and angle slice.
+    """
+
+    name = "all"
+
+    if frame_slice is not None:
+        name += "_f%i-%i" % (frame_slice.start, frame_slice.stop)
+    if angle_slice is not None:
+        name += "_a%i-%i" % (angle_slice.start, angle_slice.stop)
+
+    return name
+
+
 def exit_blender(message):
     """
     Prints a message in the terminal and quits blender.
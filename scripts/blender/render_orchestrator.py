@@ -0,0 +1,304 @@
+#!/usr/bin/python3
+#
+# Copyright 2019-2019 the openage authors. See copying.md for legal info.
+#
+# Usage:
+#  python3 render_orchestrator.py <filename> \
+#          -j <number-of-workers> \
+#          --split track|angle|frame \
+#          --chunks <slices-per-track> \
+#          -a <number-of-angles> \
+#          -f <number-of-frames> \
+#          -- <further create_sprites.py arguments>
+#
+
+"""
+Render sprites with several background Blender processes.
+
+The work of create_sprites.py is split into slices by track,
+angle or frame range. Every slice is rendered by its own
+Blender worker and failed slices are retried. The output of every
+worker is written to <blendfile>_<slice>.log next to the .blend file.
+"""
+
+import argparse
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import json
+import os
+import subprocess
+import sys
+import time
+
+CREATE_SPRITES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "create_sprites.py")
+
+# Number of output lines printed for a failed worker
+OUTPUT_TAIL = 10
+
+# Part of the render work handled by one worker.
+# angles and frames are (start, end) index ranges or None for all.
+RenderSlice = namedtuple("RenderSlice", ("track", "angles", "frames"))
+
+
+def main():
+    """
+    Main entry point function.
+    """
+
+    args, script_args = parse()
+
+    def blender_command(worker_args):
+        return [args.blender, "--background", args.blendfile,
+                "--python", args.script, "--"] + script_args + worker_args
+
+    if args.tracks is None:
+        tracks = query_tracks(blender_command(["--list-tracks"]))
+        if tracks is None:
+            sys.exit("Could not read the tracks from %s" % args.blendfile)
+    else:
+        tracks = args.tracks.split(",")
+
+    time_start = time.time()
+
+    # Compute the animation bounds once, so that the workers
+    # find them in the bounds cache.
+    if not run_command(blender_command(["--bounds-only"]),
+                       log_path(args.blendfile, "bounds")):
+        sys.exit("Could not compute the animation bounds")
+
+    slices = make_slices(tracks, args.angles, args.frames, args.split, args.chunks)
+    print("Rendering %i slices with %i workers" % (len(slices), args.jobs))
+
+    failed = run_slices(slices,
+                        lambda render_slice: blender_command(slice_args(render_slice)),
+                        args.jobs, args.retries,
+                        log=lambda render_slice: log_path(args.blendfile,
+                                                          slice_name(render_slice)))
+
+    if failed:
+        for render_slice in failed:
+            print("Failed: %s" % (slice_args(render_slice),))
+        sys.exit("%i of %i slices failed" % (len(failed), len(slices)))
+
+    print("Finished in %.4f seconds" % (time.time() - time_start))
+
+
+def parse():
+    """
+    Parse user parameters.
+
+    Arguments after "--" are passed to create_sprites.py.
+    """
+
+    argv = sys.argv[1:]
+
+    if "--" in argv:
+        script_args = argv[argv.index("--") + 1:]
+        argv = argv[:argv.index("--")]
+    else:
+        script_args = []
+
+    parser = argparse.ArgumentParser(description="Render sprites with parallel Blender workers.")
+    parser.add_argument("blendfile", help="The .blend file with the model.")
+    parser.add_argument("--blender", default="blender", type=str,
+                        help="Blender executable; default = blender")
+    parser.add_argument("--script", default=CREATE_SPRITES, type=str,
+                        help="Path of create_sprites.py.")
+    parser.add_argument("-j", "--jobs", default=os.cpu_count() or 1, type=int,
+                        help="Number of parallel workers; default = number of CPUs")
+    parser.add_argument("--split", default="track", choices=("track", "angle", "frame"),
+                        help="Split the work of every track by angle or frame; default = track")
+    parser.add_argument("--chunks", default=2, type=int,
+                        help="Number of angle or frame slices per track; default = 2")
+    parser.add_argument("--retries", default=1, type=int,
+                        help="How often a failed slice is retried; default = 1")
+    parser.add_argument("-t", "--tracks", type=str,
+                        help="Tracks to render, separate with ,; default = all tracks")
+    parser.add_argument("-a", "--angles", default=8, type=int,
+                        help="Number of angles per frame; default = 8")
+    parser.add_argument("-f", "--frames", default=10, type=int,
+                        help="Number of frames per animation; default = 10")
+    args = parser.parse_args(argv)
+
+    script_args = script_args + ["-a", str(args.angles), "-f", str(args.frames)]
+
+    return args, script_args
+
+
+def split_range(count, chunks):
+    """
+    Split range(count) into at most chunks consecutive (start, end) ranges.
+    """
+
+    chunks = max(1, min(chunks, count))
+    ranges = list()
+
+    for index in range(chunks):
+        start = count * index // chunks
+        end = count * (index + 1) // chunks
+        ranges.append((start, end))
+
+    return ranges
+
+
+def make_slices(tracks, angle_count, frame_count, split, chunks):
+    """
+    Create the render slices for all tracks.
+    """
+
+    slices = list()
+
+    for track in tracks:
+        if split == "angle":
+            for angles in split_range(angle_count, chunks):
+                slices.append(RenderSlice(track, angles, None))
+        elif split == "frame":
+            for frames in split_range(frame_count, chunks):
+                slices.append(RenderSlice(track, None, frames))
+        else:
+            slices.append(RenderSlice(track, None, None))
+
+    return slices
+
+
+def slice_args(render_slice):
+    """
+    Return the create_sprites.py arguments for a render slice.
+    """
+
+    worker_args = ["-t", render_slice.track]
+
+    if render_slice.angles is not None:
+        worker_args += ["--angle-slice", "%i:%i" % render_slice.angles]
+    if render_slice.frames is not None:
+        worker_args += ["--frame-slice", "%i:%i" % render_slice.frames]
+
+    return worker_args
+
+
+def slice_name(render_slice):
+    """
+    Return a short name of a render slice for file names.
+    """
+
+    name = render_slice.track
+
+    if render_slice.angles is not None:
+        name += "_a%i-%i" % render_slice.angles
+    if render_slice.frames is not None:
+        name += "_f%i-%i" % render_slice.frames
+
+    return name
+
+
+def log_path(blendfile, name):
+    """
+    Return the path of the log file of a worker.
+    """
+
+    return "%s_%s.log" % (os.path.splitext(blendfile)[0], name)
+
+
+def run_command(command, log=None):
+    """
+    Run a worker process and return whether it succeeded.
+
+    The output of the worker is written to the log file, if one
+    is given. If the worker fails, the end of its output is printed.
+    """
+
+    try:
+        if log is None:
+            result = subprocess.run(command, stdout=subprocess.PIPE,
+                                    stderr=subprocess.STDOUT,
+                                    universal_newlines=True, check=False)
+            output = result.stdout
+        else:
+            with open(log, "w") as log_file:
+                result = subprocess.run(command, stdout=log_file,
+                                        stderr=subprocess.STDOUT, check=False)
+            output = None
+    except OSError as error:
+        print("Could not start %s: %s" % (command[0], error))
+        return False
+
+    if result.returncode == 0:
+        return True
+
+    if output is None:
+        try:
+            with open(log, "r", errors="replace") as log_file:
+                output = log_file.read()
+        except OSError:
+            output = ""
+
+    lines = output.splitlines()[-OUTPUT_TAIL:]
+    message = "Worker exited with code %i" % result.returncode
+    if log is not None:
+        message += ", full output in %s" % log
+    print("%s:\n%s" % (message, "\n".join("  " + line for line in lines)))
+
+    return False
+
+
+def query_tracks(command):
+    """
+    Run create_sprites.py with --list-tracks and return the track names.
+    """
+
+    try:
+        result = subprocess.run(command, stdout=subprocess.PIPE,
+                                universal_newlines=True, check=False)
+    except OSError as error:
+        print("Could not start %s: %s" % (command[0], error))
+        return None
+
+    for line in result.stdout.splitlines():
+        if line.startswith("TRACKS "):
+            return json.loads(line[len("TRACKS "):])
+
+    return None
+
+
+def run_slices(slices, build_command, jobs, retries, run=run_command, log=None):
+    """
+    Run all slices with at most jobs parallel workers.
+
+    A failed slice is scheduled again until it was retried
+    retries times. Returns the slices that failed in the end.
+    If log is given, it returns the log file of a slice.
+    """
+
+    def submit(render_slice):
+        if log is None:
+            return executor.submit(run, build_command(render_slice))
+        return executor.submit(run, build_command(render_slice), log(render_slice))
+
+    attempts = {render_slice: 0 for render_slice in slices}
+    failed = list()
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        running = {submit(render_slice): render_slice for render_slice in slices}
+
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                render_slice = running.pop(future)
+                attempts[render_slice] += 1
+
+                if future.result():
+                    print("Done: %s" % (slice_args(render_slice),))
+
+                elif attempts[render_slice] <= retries:
+                    print("Retrying: %s" % (slice_args(render_slice),))
+                    running[submit(render_slice)] = render_slice
+
+                else:
+                    failed.append(render_slice)
+
+    return failed
+
+
+if __name__ == "__main__":
+    main()
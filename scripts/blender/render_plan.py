@@ -0,0 +1,216 @@
+# Copyright 2019-2019 the openage authors. See copying.md for legal info.
+
+"""
+Render plan for create_sprites.py.
+
+The plan lists every image of every animation before rendering
+starts, so that scene frames used by several animation frames are
+only rendered once. It is written as a manifest for tools that
+process the rendered images.
+"""
+
+from collections import OrderedDict, namedtuple
+import json
+import os
+import posixpath
+
+from assettools.fileutil import atomic_write
+
+PLAN_VERSION = 0
+
+# One image of an animation: the animation frame and angle it shows,
+# the scene frame that is rendered for it and the output file
+# relative to the output folder.
+RenderItem = namedtuple("RenderItem", ("track", "frame_index", "scene_frame",
+                                       "angle_index", "angle", "path"))
+
+
+def animation_frames(start_frame, end_frame, frame_count):
+    """
+    Return the scene frames that are rendered for an animation
+    from start_frame to end_frame with frame_count frames.
+    """
+
+    if frame_count <= 1:
+        return [start_frame]
+
+    frame_distance = (end_frame - start_frame) / (frame_count - 1)
+
+    return [start_frame + int(index * frame_distance) for index in range(frame_count)]
+
+
+def render_angles(angle_count, legacy):
+    """
+    Return the (index, angle) pairs an animation frame is rendered from.
+
+    In legacy mode, only half of the sprites are rendered.
+    """
+
+    angle_distance = 360 / angle_count
+
+    max_rotation = 360
+    if legacy:
+        max_rotation = 180 + angle_distance
+
+    angles = list()
+
+    angle = 0
+    index = 0
+
+    while angle < (max_rotation - angle_distance):
+
+        angle = angle_distance * index
+        angles.append((index, angle))
+
+        index += 1
+
+    return angles
+
+
+def output_filename(track_name, scene_frame, angle_index, angle, extension=".png"):
+    """
+    Return the path of an image relative to the output folder.
+
+    sprite_merge.py reads frame and angle from this name.
+    """
+
+    return "%s/%s_%03i_%03.f%s" % (track_name, str(scene_frame).zfill(3), angle_index, angle,
+                                   extension)
+
+
+def build_render_plan(tracks, angle_count, frame_count, legacy, extension=".png"):
+    """
+    Create the plan for tracks given as (name, start_frame, end_frame).
+    """
+
+    angles = render_angles(angle_count, legacy)
+    plan = list()
+
+    for track_name, start_frame, end_frame in tracks:
+        scene_frames = animation_frames(start_frame, end_frame, frame_count)
+
+        for frame_index, scene_frame in enumerate(scene_frames):
+            for angle_index, angle in angles:
+                plan.append(RenderItem(track_name, frame_index, scene_frame,
+                                       angle_index, angle,
+                                       output_filename(track_name, scene_frame,
+                                                       angle_index, angle, extension)))
+
+    return plan
+
+
+def filter_plan(plan, frame_slice=None, angle_slice=None):
+    """
+    Return the items with a frame and angle index in the slices.
+
+    Several frame indices can show the same scene frame. Such a scene
+    frame belongs to the frame slice of its first frame index, so
+    that workers rendering other frame slices do not write the same
+    images at the same time.
+    """
+
+    first_index = dict()
+    for item in plan:
+        first_index.setdefault((item.track, item.scene_frame), item.frame_index)
+
+    return [item for item in plan
+            if (frame_slice is None or
+                first_index[(item.track, item.scene_frame)] in frame_slice) and
+            (angle_slice is None or item.angle_index in angle_slice)]
+
+
+def unique_renders(plan):
+    """
+    Group the images that have to be rendered by track and scene frame.
+
+    Items with the same output are only listed once. Returns an
+    ordered mapping of (track, scene_frame) to the items to render.
+    """
+
+    renders = OrderedDict()
+    seen = set()
+
+    for item in plan:
+        if item.path in seen:
+            continue
+
+        seen.add(item.path)
+        renders.setdefault((item.track, item.scene_frame), list()).append(item)
+
+    return renders
+
+
+def frame_runs(frames):
+    """
+    Split sorted scene frames into runs of evenly spaced frames.
+
+    Returns (first, last, step) for every run, so that each run can
+    be rendered as one animation.
+    """
+
+    runs = list()
+    index = 0
+
+    while index < len(frames):
+        first = frames[index]
+
+        if index + 1 == len(frames):
+            runs.append((first, first, 1))
+            break
+
+        step = frames[index + 1] - first
+        last_index = index + 1
+
+        while last_index + 1 < len(frames) and frames[last_index + 1] - frames[last_index] == step:
+            last_index += 1
+
+        runs.append((first, frames[last_index], step))
+        index = last_index + 1
+
+    return runs
+
+
+def plan_manifest(plan, track_name):
+    """
+    Return the plan of one track as a JSON-serializable dictionary.
+
+    Files are given relative to the output folder of the track.
+    """
+
+    frames = OrderedDict()
+
+    for item in plan:
+        if item.track != track_name:
+            continue
+
+        frame = frames.setdefault(item.frame_index, {
+            "index": item.frame_index,
+            "scene_frame": item.scene_frame,
+            "angles": list(),
+        })
+        frame["angles"].append({
+            "index": item.angle_index,
+            "angle": item.angle,
+            "file": posixpath.basename(item.path),
+        })
+
+    return {
+        "version": PLAN_VERSION,
+        "track": track_name,
+        "frames": list(frames.values()),
+    }
+
+
+def write_render_plan(plan, track_name, path):
+    """
+    Write the plan manifest of one track to a file.
+    """
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    # Parallel workers may write the plan at the same time,
+    # so the file is replaced in one step.
+    with atomic_write(path) as plan_file:
+        json.dump(plan_manifest(plan, track_name), plan_file, indent=1)
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+#
+# Copyright 2019-2019 the openage authors. See copying.md for legal info.
+#
+# Usage:
+#  python3 render_orchestrator.py <scene.json> --blender fake_blender.py
+#
+
+"""
+Stand-in for the blender executable, so that render_orchestrator.py
+can be run without Blender.
+
+Instead of a .blend file, it is given a JSON scene description:
+
+    {
+        "tracks": ["walk", "attack"],
+        "failures": [{"match": "-t walk --angle-slice 0:4", "count": 1}]
+    }
+
+--list-tracks prints the tracks and --bounds-only succeeds. Every
+other call is a render worker: it fails while a failure entry
+matches its create_sprites.py arguments and the worker was started
+fewer than count times before with the same arguments. Every worker
+call is appended to <scene.json>.calls as one JSON line.
+"""
+
+import json
+import sys
+
+
+def main():
+    """
+    Act like a background Blender process running create_sprites.py.
+    """
+
+    argv = sys.argv[1:]
+    scene_path = argv[argv.index("--background") + 1]
+    script_args = argv[argv.index("--") + 1:] if "--" in argv else list()
+
+    with open(scene_path, "r") as scene_file:
+        scene = json.load(scene_file)
+
+    if "--list-tracks" in script_args:
+        print("TRACKS %s" % json.dumps(scene.get("tracks", list())))
+        return 0
+
+    if "--bounds-only" in script_args:
+        return 0
+
+    log_path = scene_path + ".calls"
+    command = " ".join(script_args)
+
+    try:
+        with open(log_path, "r") as log_file:
+            earlier_calls = [json.loads(line) for line in log_file]
+    except FileNotFoundError:
+        earlier_calls = list()
+
+    with open(log_path, "a") as log_file:
+        log_file.write(json.dumps(command) + "\n")
+
+    for failure in scene.get("failures", list()):
+        if failure["match"] in command and earlier_calls.count(command) < failure["count"]:
+            # Like create_sprites.exit_blender()
+            print("Error: fake failure of %s" % command)
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
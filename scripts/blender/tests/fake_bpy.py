@@ -0,0 +1,193 @@
+# Copyright 2019-2019 the openage authors. See copying.md for legal info.
+
+"""
+Stand-in for Blender's bpy module.
+
+It provides the parts of the API that the bounds scan of
+create_sprites.py uses, so the scan can be tested and benchmarked
+without Blender:
+
+    model.to_mesh(depsgraph, apply_modifiers)
+    mesh.vertices (iteration, len() and foreach_get("co", ...))
+    bpy.data.meshes.remove(mesh)
+    scene.frame_start, scene.frame_set(), scene.update()
+    track.mute, track.strips[-1].frame_end
+
+Call install() before create_sprites is imported.
+"""
+
+import sys
+import types
+
+import numpy
+
+
+class FakeVertex:
+    """
+    Vertex with a coordinate, like bpy.types.MeshVertex.
+    """
+
+    def __init__(self, co):
+        self.co = co
+
+
+class FakeVertices:
+    """
+    Vertex collection of a mesh.
+    """
+
+    def __init__(self, coords):
+        self.coords = coords
+
+    def __len__(self):
+        return len(self.coords)
+
+    def __iter__(self):
+        for row in self.coords:
+            yield FakeVertex(tuple(row))
+
+    def foreach_get(self, attribute, target):
+        if attribute != "co":
+            raise AttributeError(attribute)
+
+        target[:] = self.coords.ravel()
+
+
+class FakeMesh:
+    """
+    Mesh copy returned by FakeModel.to_mesh().
+    """
+
+    def __init__(self, coords):
+        self.vertices = FakeVertices(coords)
+
+
+class FakeMeshes:
+    """
+    bpy.data.meshes, which counts the meshes that are still alive.
+    """
+
+    def __init__(self):
+        self.alive = set()
+
+    def add(self, mesh):
+        self.alive.add(id(mesh))
+        return mesh
+
+    def remove(self, mesh):
+        self.alive.remove(id(mesh))
+
+
+class FakeScene:
+    """
+    Scene with a current frame.
+    """
+
+    def __init__(self, frame_start=1):
+        self.frame_start = frame_start
+        self.frame_current = frame_start
+        self.frames_set = list()
+
+    def frame_set(self, frame):
+        self.frame_current = frame
+        self.frames_set.append(frame)
+
+    def update(self):
+        pass
+
+
+class FakeModel:
+    """
+    Animated model. The local vertex coordinates and the world
+    matrix are functions of the current frame of the scene.
+    """
+
+    def __init__(self, name, scene, meshes, coords_at, matrix_at):
+        self.name = name
+        self.scene = scene
+        self.meshes = meshes
+        self.coords_at = coords_at
+        self.matrix_at = matrix_at
+
+    @property
+    def matrix_world(self):
+        return self.matrix_at(self.scene.frame_current)
+
+    def to_mesh(self, depsgraph, apply_modifiers):
+        return self.meshes.add(FakeMesh(self.coords_at(self.scene.frame_current)))
+
+
+class FakeCollection:
+    """
+    Collection of models.
+    """
+
+    def __init__(self, objects):
+        self.all_objects = objects
+
+
+class FakeStrip:
+    """
+    NLA strip ending at a frame.
+    """
+
+    def __init__(self, frame_end):
+        self.frame_end = frame_end
+
+
+class FakeTrack:
+    """
+    NLA track with one strip.
+    """
+
+    def __init__(self, name, frame_end):
+        self.name = name
+        self.mute = True
+        self.strips = [FakeStrip(frame_end)]
+
+
+def animated_model(name, scene, meshes, vertex_count, seed=0):
+    """
+    Create a model whose vertices wobble and whose world matrix
+    moves and rotates over the frames.
+    """
+
+    base = numpy.random.RandomState(seed).uniform(-1.0, 1.0, (vertex_count, 3))
+    phases = numpy.linspace(0.0, numpy.pi, vertex_count)[:, None]
+
+    def coords_at(frame):
+        return base * (1.0 + 0.3 * numpy.sin(0.2 * frame + phases))
+
+    def matrix_at(frame):
+        angle = 0.1 * frame
+        cos, sin = numpy.cos(angle), numpy.sin(angle)
+
+        return numpy.array([[cos, -sin, 0.0, 0.05 * frame],
+                            [sin, cos, 0.0, -0.02 * frame],
+                            [0.0, 0.0, 1.5, 0.1 * numpy.sin(frame)],
+                            [0.0, 0.0, 0.0, 1.0]])
+
+    return FakeModel(name, scene, meshes, coords_at, matrix_at)
+
+
+def install(scene=None):
+    """
+    Register the fake bpy module and return it.
+
+    Test modules share one fake module, because create_sprites
+    keeps the bpy module it was imported with.
+    """
+
+    bpy = sys.modules.get("bpy")
+    if getattr(bpy, "IS_FAKE", False):
+        return bpy
+
+    bpy = types.ModuleType("bpy")
+    bpy.IS_FAKE = True
+    bpy.context = types.SimpleNamespace(scene=scene or FakeScene(), depsgraph=None)
+    bpy.data = types.SimpleNamespace(meshes=FakeMeshes(), filepath="")
+    bpy.path = types.SimpleNamespace(abspath=lambda path: path)
+
+    sys.modules["bpy"] = bpy
+
+    return bpy
@@ -0,0 +1,169 @@
+# Copyright 2019-2019 the openage authors. See copying.md for legal info.
+
+"""
+Checks the vectorized bounds scan of create_sprites.py against the
+per-vertex scan it replaced, using the fake bpy module.
+
+Run as script to benchmark both scans:
+
+    $ python3 test_bounds_scan.py [vertex-count]
+"""
+
+import os
+import sys
+import time
+import unittest
+
+import numpy
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+# pylint: disable=wrong-import-position
+import fake_bpy
+
+BPY = fake_bpy.install()
+
+import create_sprites
+
+
+def reference_model_bounds(model):
+    """
+    The old scan: transform every vertex with the world matrix and
+    compare its coordinates one by one.
+    """
+
+    matrix = model.matrix_world
+    cur_mesh = model.to_mesh(None, True)
+
+    highest = [-float("inf")] * 3
+    lowest = [float("inf")] * 3
+
+    for vertex in cur_mesh.vertices:
+        location = matrix[:3, :3] @ numpy.array(vertex.co) + matrix[:3, 3]
+
+        for axis in range(3):
+            if location[axis] > highest[axis]:
+                highest[axis] = location[axis]
+            if location[axis] < lowest[axis]:
+                lowest[axis] = location[axis]
+
+    BPY.data.meshes.remove(cur_mesh)
+
+    return numpy.array(lowest), numpy.array(highest)
+
+
+def reference_scan(models, tracks):
+    """
+    The old scan over every frame of every track.
+    """
+
+    scene = BPY.context.scene
+
+    highest = numpy.zeros(3)
+    lowest = numpy.zeros(3)
+
+    for track in tracks:
+        for frame in range(scene.frame_start, int(numpy.ceil(track.strips[-1].frame_end)) + 1):
+            scene.frame_set(frame)
+
+            for model in models.all_objects:
+                model_lowest, model_highest = reference_model_bounds(model)
+
+                numpy.maximum(highest, model_highest, out=highest)
+                numpy.minimum(lowest, model_lowest, out=lowest)
+
+    return lowest, highest
+
+
+def make_scene(vertex_count, model_count=2):
+    """
+    Return animated models and two tracks in the fake scene.
+    """
+
+    scene = fake_bpy.FakeScene(frame_start=1)
+    BPY.context.scene = scene
+
+    models = fake_bpy.FakeCollection([
+        fake_bpy.animated_model("model%i" % index, scene, BPY.data.meshes, vertex_count, index)
+        for index in range(model_count)
+    ])
+    tracks = [fake_bpy.FakeTrack("walk", 24.0), fake_bpy.FakeTrack("attack", 17.5)]
+
+    return models, tracks
+
+
+class BoundsScanTest(unittest.TestCase):
+    """
+    Compare the vectorized and the per-vertex bounds scan.
+    """
+
+    def test_model_bounds(self):
+        models, _ = make_scene(500)
+
+        for frame in (1, 7, 20):
+            BPY.context.scene.frame_set(frame)
+
+            for model in models.all_objects:
+                lowest, highest = create_sprites.model_bounds(model)
+                ref_lowest, ref_highest = reference_model_bounds(model)
+
+                numpy.testing.assert_allclose(lowest, ref_lowest)
+                numpy.testing.assert_allclose(highest, ref_highest)
+
+    def test_scan_all_frames(self):
+        models, tracks = make_scene(300)
+
+        lowest, highest = create_sprites.scan_animation_bounds(models, tracks, "all", 10, 4)
+        ref_lowest, ref_highest = reference_scan(models, tracks)
+
+        numpy.testing.assert_allclose(lowest, ref_lowest)
+        numpy.testing.assert_allclose(highest, ref_highest)
+
+    def test_sampled_scans_stay_inside(self):
+        models, tracks = make_scene(300)
+        ref_lowest, ref_highest = reference_scan(models, tracks)
+
+        for sampling in ("rendered", "coarse"):
+            lowest, highest = create_sprites.scan_animation_bounds(models, tracks,
+                                                                   sampling, 10, 4)
+
+            self.assertTrue((lowest >= ref_lowest - 1e-9).all())
+            self.assertTrue((highest <= ref_highest + 1e-9).all())
+
+    def test_meshes_are_removed(self):
+        models, tracks = make_scene(50)
+
+        create_sprites.scan_animation_bounds(models, tracks, "all", 10, 4)
+
+        self.assertEqual(len(BPY.data.meshes.alive), 0)
+
+    def test_tracks_are_muted_again(self):
+        models, tracks = make_scene(50)
+
+        create_sprites.scan_animation_bounds(models, tracks, "coarse", 10, 4)
+
+        self.assertTrue(all(track.mute for track in tracks))
+
+
+def benchmark(vertex_count):
+    """
+    Print the time of both scans for models with vertex_count vertices.
+    """
+
+    models, tracks = make_scene(vertex_count)
+
+    time_start = time.time()
+    reference_scan(models, tracks)
+    reference_time = time.time() - time_start
+
+    time_start = time.time()
+    create_sprites.scan_animation_bounds(models, tracks, "all", 10, 4)
+    scan_time = time.time() - time_start
+
+    print("%i vertices: per-vertex scan %.4f seconds, vectorized scan %.4f seconds"
+          % (vertex_count, reference_time, scan_time))
+
+
+if __name__ == "__main__":
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
@@ -0,0 +1,128 @@
+# Copyright 2019-2019 the openage authors. See copying.md for legal info.
+
+"""
+Checks that the fitted orthographic camera shows the whole model
+bounds from every angle.
+"""
+
+from math import radians
+import os
+import sys
+import unittest
+
+import numpy
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+# pylint: disable=wrong-import-position
+from camera_fit import DIMETRIC_TILT, camera_location, fit_orthographic_camera
+
+X_AXIS = numpy.array((1.0, 0.0, 0.0))
+Z_AXIS = numpy.array((0.0, 0.0, 1.0))
+
+
+def rotate(vector, axis, angle):
+    """
+    Rotate a vector around a unit axis (angle in radians).
+    """
+
+    return (vector * numpy.cos(angle) +
+            numpy.cross(axis, vector) * numpy.sin(angle) +
+            axis * numpy.dot(axis, vector) * (1 - numpy.cos(angle)))
+
+
+def camera_to_world(vector, camera_rotation_z, pivot_angle):
+    """
+    Transform a vector from camera space to world space. The camera
+    is tilted, rotated around z and parented to the rotated pivot.
+    """
+
+    vector = rotate(vector, X_AXIS, radians(DIMETRIC_TILT))
+    vector = rotate(vector, Z_AXIS, camera_rotation_z)
+
+    return rotate(vector, Z_AXIS, radians(pivot_angle))
+
+
+def corners(half_dims):
+    """
+    Return the corners of a box centered on the origin.
+    """
+
+    return [numpy.array((x, y, z)) * half_dims
+            for x in (-1, 1) for y in (-1, 1) for z in (-1, 1)]
+
+
+class CameraFitTest(unittest.TestCase):
+    """
+    Projects the box corners with the fitted camera for every angle.
+    """
+
+    def check_fit(self, half_dims, camera_rotation_z, angle_count, resolution):
+        half_dims = numpy.array(half_dims, dtype=numpy.float64)
+        angles = [360 / angle_count * index for index in range(angle_count)]
+
+        scales, centers = fit_orthographic_camera(half_dims, camera_rotation_z,
+                                                  angles, resolution)
+        best_index = int(scales.argmax())
+        scale = scales[best_index]
+        location, distance = camera_location(half_dims, camera_rotation_z,
+                                             centers[best_index])
+
+        # Blender applies the orthographic scale to the longer side
+        res_x, res_y = resolution
+        if res_x >= res_y:
+            frame = (scale / 2, scale * res_y / res_x / 2)
+        else:
+            frame = (scale * res_x / res_y / 2, scale / 2)
+
+        clip_end = 2 * distance + 1.0
+        largest_offset = 0.0
+
+        for angle in angles:
+            axes = [camera_to_world(axis, camera_rotation_z, angle)
+                    for axis in numpy.eye(3)]
+            camera_position = rotate(numpy.array(location), Z_AXIS, radians(angle))
+
+            for corner in corners(half_dims):
+                offset = corner - camera_position
+                cam_x, cam_y, cam_z = (numpy.dot(offset, axis) for axis in axes)
+
+                self.assertLessEqual(abs(cam_x), frame[0] + 1e-9)
+                self.assertLessEqual(abs(cam_y), frame[1] + 1e-9)
+
+                # In front of the camera and before the far clip plane
+                self.assertGreater(-cam_z, 0)
+                self.assertLess(-cam_z, clip_end)
+
+                largest_offset = max(largest_offset,
+                                     abs(cam_x) / frame[0], abs(cam_y) / frame[1])
+
+        # The box touches the frame, so the scale is not larger than needed
+        self.assertAlmostEqual(largest_offset, 1.0)
+
+    def test_landscape(self):
+        for camera_rotation_z in (radians(45), 0.3, 0.0):
+            self.check_fit((1.0, 2.5, 0.7), camera_rotation_z, 8, (400, 200))
+            self.check_fit((0.3, 0.4, 3.0), camera_rotation_z, 5, (640, 480))
+
+    def test_portrait(self):
+        for camera_rotation_z in (radians(45), 0.3, 0.0):
+            self.check_fit((1.0, 2.5, 0.7), camera_rotation_z, 8, (200, 400))
+            self.check_fit((2.0, 0.5, 0.2), camera_rotation_z, 5, (300, 1000))
+
+    def test_square(self):
+        self.check_fit((1.5, 1.0, 2.0), radians(45), 16, (256, 256))
+
+    def test_camera_location(self):
+        half_dims = numpy.array((1.0, 2.0, 3.0))
+        location, distance = camera_location(half_dims, radians(45), (0.5, -0.25))
+
+        self.assertAlmostEqual(distance, numpy.linalg.norm(half_dims) + 1.0)
+
+        # The location is the projected center moved back along the view axis
+        expected = camera_to_world(numpy.array((0.5, -0.25, distance)), radians(45), 0)
+        numpy.testing.assert_allclose(location, expected, atol=1e-12)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+# Copyright 2019-2019 the openage authors. See copying.md for legal info.
+
+"""
+Checks the contact sheet of the preview mode.
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+# pylint: disable=wrong-import-position
+import fake_bpy
+
+fake_bpy.install()
+
+import create_sprites
+
+
+def viewer_cell(value, alpha=1.0):
+    """
+    Float pixels like the viewer node holds them, with a marker
+    in the bottom row.
+    """
+
+    pixels = numpy.full((2, 3, 4), value * alpha, dtype=numpy.float32)
+    pixels[..., 3] = alpha
+    pixels[0, 0] = (0.0, 0.0, 0.0, 0.0)
+
+    return pixels
+
+
+class ContactSheetTest(unittest.TestCase):
+    """
+    Cells are converted like rendered PNGs and arranged in a grid.
+    """
+
+    def test_png_colours(self):
+        from PIL import Image
+
+        rows = [
+            [create_sprites.float_to_rgba8(viewer_cell(0.5)),
+             create_sprites.float_to_rgba8(viewer_cell(1.0, 0.5))],
+            [create_sprites.float_to_rgba8(viewer_cell(0.0))],
+        ]
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "preview", "preview.png")
+            create_sprites.write_contact_sheet(rows, path)
+
+            with Image.open(path) as image:
+                self.assertEqual(image.mode, "RGBA")
+                sheet = numpy.asarray(image)
+
+        self.assertEqual(sheet.shape, (4, 6, 4))
+
+        # Linear 0.5 is sRGB 188, the alpha is not premultiplied
+        self.assertEqual(tuple(sheet[0, 1]), (188, 188, 188, 255))
+        self.assertEqual(tuple(sheet[0, 4]), (255, 255, 255, 128))
+        self.assertEqual(tuple(sheet[2, 1]), (0, 0, 0, 255))
+
+        # The bottom row of the viewer is the bottom row of each cell
+        self.assertEqual(tuple(sheet[1, 0]), (0, 0, 0, 0))
+        self.assertEqual(tuple(sheet[1, 3]), (0, 0, 0, 0))
+
+        # Short rows are padded with transparent cells
+        self.assertFalse(sheet[2:, 3:].any())
+
+
+if __name__ == "__main__":
+    unittest.main()
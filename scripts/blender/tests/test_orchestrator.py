@@ -0,0 +1,116 @@
+# Copyright 2019-2019 the openage authors. See copying.md for legal info.
+
+"""
+Checks the scheduling of render_orchestrator.py with the fake
+blender executable.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+
+sys.path.insert(0, os.path.join(TEST_DIR, ".."))
+
+# pylint: disable=wrong-import-position
+import render_orchestrator
+
+FAKE_BLENDER = os.path.join(TEST_DIR, "fake_blender.py")
+ORCHESTRATOR = os.path.join(TEST_DIR, "..", "render_orchestrator.py")
+
+
+class OrchestratorTest(unittest.TestCase):
+    """
+    Run slices with workers that fail a given number of times.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.scene_path = os.path.join(self.directory.name, "scene.json")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write_scene(self, tracks, failures=()):
+        with open(self.scene_path, "w") as scene_file:
+            json.dump({"tracks": tracks, "failures": list(failures)}, scene_file)
+
+    def worker_calls(self):
+        with open(self.scene_path + ".calls", "r") as log_file:
+            return [json.loads(line) for line in log_file]
+
+    def build_command(self, render_slice):
+        return [sys.executable, FAKE_BLENDER, "--background", self.scene_path,
+                "--python", "create_sprites.py", "--"] + \
+            render_orchestrator.slice_args(render_slice)
+
+    def test_retry_until_success(self):
+        self.write_scene(["walk", "attack"],
+                         [{"match": "-t walk --angle-slice 0:4", "count": 2}])
+        slices = render_orchestrator.make_slices(["walk", "attack"], 8, 10, "angle", 2)
+
+        failed = render_orchestrator.run_slices(slices, self.build_command, 3, 2)
+
+        self.assertEqual(failed, list())
+
+        calls = self.worker_calls()
+        self.assertEqual(len(calls), len(slices) + 2)
+        self.assertEqual(calls.count("-t walk --angle-slice 0:4"), 3)
+        self.assertEqual(calls.count("-t attack --angle-slice 4:8"), 1)
+
+    def test_give_up_after_retries(self):
+        self.write_scene(["walk"], [{"match": "--frame-slice 5:10", "count": 5}])
+        slices = render_orchestrator.make_slices(["walk"], 8, 10, "frame", 2)
+
+        failed = render_orchestrator.run_slices(slices, self.build_command, 2, 1)
+
+        self.assertEqual(failed, [render_orchestrator.RenderSlice("walk", None, (5, 10))])
+        self.assertEqual(self.worker_calls().count("-t walk --frame-slice 5:10"), 2)
+
+    def test_command_line(self):
+        self.write_scene(["walk", "attack"], [{"match": "-t attack", "count": 1}])
+
+        result = subprocess.run([sys.executable, ORCHESTRATOR, self.scene_path,
+                                 "--blender", FAKE_BLENDER, "-j", "2",
+                                 "--split", "frame", "--chunks", "2", "-f", "6"],
+                                stdout=subprocess.PIPE, universal_newlines=True,
+                                check=False)
+
+        self.assertEqual(result.returncode, 0)
+        self.assertIn("Rendering 4 slices with 2 workers", result.stdout)
+
+        calls = self.worker_calls()
+        self.assertEqual(calls.count("-a 8 -f 6 -t attack --frame-slice 0:3"), 2)
+        self.assertEqual(calls.count("-a 8 -f 6 -t walk --frame-slice 3:6"), 1)
+
+    def test_command_line_failure(self):
+        self.write_scene(["walk"], [{"match": "-t walk", "count": 3}])
+
+        result = subprocess.run([sys.executable, ORCHESTRATOR, self.scene_path,
+                                 "--blender", FAKE_BLENDER, "--retries", "1"],
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                universal_newlines=True, check=False)
+
+        self.assertNotEqual(result.returncode, 0)
+        self.assertIn("1 of 1 slices failed", result.stderr)
+
+        # The reason of the failure is reported and kept in the log of the slice
+        self.assertIn("Error: fake failure of", result.stdout)
+
+        with open(os.path.join(self.directory.name, "scene_walk.log"), "r") as log_file:
+            self.assertIn("Error: fake failure of", log_file.read())
+
+    def test_failure_output_without_log(self):
+        self.write_scene(["walk"], [{"match": "-t walk", "count": 1}])
+        command = self.build_command(render_orchestrator.RenderSlice("walk", None, None))
+
+        self.assertFalse(render_orchestrator.run_command(command))
+        self.assertTrue(render_orchestrator.run_command(command))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+# Copyright 2019-2019 the openage authors. See copying.md for legal info.
+
+"""
+Checks that render manifests of parallel workers do not lose
+each other's entries.
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+# pylint: disable=wrong-import-position
+import fake_bpy
+
+fake_bpy.install()
+
+import create_sprites
+
+PARAMS = {"blend_hash": "0", "angles": 8}
+
+
+class RenderManifestTest(unittest.TestCase):
+    """
+    Two workers render different slices of the same track.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.track_dir = self.directory.name
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def render(self, name, content=b"image"):
+        path = os.path.join(self.track_dir, name)
+        with open(path, "wb") as image_file:
+            image_file.write(content)
+        return path
+
+    def test_parallel_saves(self):
+        first = create_sprites.RenderManifest(self.track_dir, "all_f0-5", PARAMS)
+        second = create_sprites.RenderManifest(self.track_dir, "all_f5-10", PARAMS)
+
+        # Saves interleave like they do with parallel workers
+        first.add(self.render("001_000_000.png"))
+        second.add(self.render("006_000_000.png"))
+        first.save()
+        second.save()
+        first.add(self.render("002_000_000.png"))
+        second.add(self.render("007_000_000.png"))
+        second.save()
+        first.save()
+
+        resumed = create_sprites.RenderManifest(self.track_dir, "all", PARAMS)
+
+        for name in ("001_000_000.png", "002_000_000.png",
+                     "006_000_000.png", "007_000_000.png"):
+            self.assertTrue(resumed.is_valid(os.path.join(self.track_dir, name)), name)
+
+    def test_changed_output(self):
+        manifest = create_sprites.RenderManifest(self.track_dir, "all", PARAMS)
+        manifest.add(self.render("001_000_000.png"))
+        manifest.save()
+
+        path = self.render("001_000_000.png", b"changed")
+        resumed = create_sprites.RenderManifest(self.track_dir, "all", PARAMS)
+
+        self.assertFalse(resumed.is_valid(path))
+        self.assertFalse(resumed.is_valid(os.path.join(self.track_dir, "missing.png")))
+
+    def test_other_params(self):
+        manifest = create_sprites.RenderManifest(self.track_dir, "all", PARAMS)
+        path = self.render("001_000_000.png")
+        manifest.add(path)
+        manifest.save()
+
+        resumed = create_sprites.RenderManifest(self.track_dir, "all",
+                                                {"blend_hash": "1", "angles": 8})
+
+        self.assertFalse(resumed.is_valid(path))
+
+    def test_slice_names(self):
+        self.assertEqual(create_sprites.manifest_slice_name(None, None), "all")
+        self.assertEqual(create_sprites.manifest_slice_name(range(0, 5), range(4, 8)),
+                         "all_f0-5_a4-8")
+
+
+if __name__ == "__main__":
+    unittest.main()
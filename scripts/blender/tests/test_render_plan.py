@@ -0,0 +1,53 @@
+# Copyright 2019-2019 the openage authors. See copying.md for legal info.
+
+"""
+Checks how the render plan is split between render workers.
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+# pylint: disable=wrong-import-position
+from render_orchestrator import split_range
+from render_plan import build_render_plan, filter_plan, unique_renders
+
+
+class FrameSliceTest(unittest.TestCase):
+    """
+    Every image is rendered by exactly one frame slice.
+    """
+
+    def check_slices(self, tracks, frame_count, chunks):
+        plan = build_render_plan(tracks, 4, frame_count, False)
+        all_paths = {item.path for item in plan}
+
+        rendered = list()
+        for start, end in split_range(frame_count, chunks):
+            for items in unique_renders(filter_plan(plan, range(start, end))).values():
+                rendered.extend(item.path for item in items)
+
+        self.assertEqual(len(rendered), len(set(rendered)))
+        self.assertEqual(set(rendered), all_paths)
+
+    def test_short_strip(self):
+        # animation_frames(1, 3, 10) is [1, 1, 1, 1, 1, 2, 2, 2, 2, 3]
+        self.check_slices([("walk", 1, 3)], 10, 2)
+        self.check_slices([("walk", 1, 3)], 10, 4)
+
+    def test_long_strip(self):
+        self.check_slices([("walk", 1, 40), ("idle", 1, 5)], 10, 3)
+
+    def test_angle_slice(self):
+        plan = build_render_plan([("walk", 1, 3)], 4, 10, False)
+        items = filter_plan(plan, None, range(1, 2))
+
+        self.assertTrue(items)
+        self.assertTrue(all(item.angle_index == 1 for item in items))
+
+
+if __name__ == "__main__":
+    unittest.main()